@@ -12,5 +12,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Riddle.settings')
+os.environ.setdefault('RIDDLE_ASYNC_VIEWS', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from questions.live import events_application  # noqa: E402
+
+# Server-sent events of the question pages are streamed next to Django.
+application = events_application(django_application)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Without DEBUG, collected static files are answered before anything else (questions/staticfiles.py).
+    'questions.staticfiles.static_files_middleware',
+    'questions.metrics.request_metrics_middleware',
+    'questions.routers.primary_pin_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,7 +63,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'questions.metrics.InstrumentedTemplates',
         'DIRS': [BASE_DIR / 'templates']
         ,
         'APP_DIRS': True,
@@ -83,9 +88,54 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Seconds a connection waits for the write lock before "database is locked".
+        'OPTIONS': {'timeout': 20},
     }
 }
 
+# Read replicas for the feed, tag, question and sidebar queries (questions/routers.py).
+# Locally they are SQLite copies of the primary, e.g.
+#   RIDDLE_SQLITE_REPLICAS=db.replica1.sqlite3 python manage.py sync_replicas --interval 1
+# Tests mirror them to the primary.
+for number, name in enumerate(filter(None, os.environ.get('RIDDLE_SQLITE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / name,
+        'OPTIONS': {'timeout': 20},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['questions.routers.PrimaryReplicaRouter']
+
+# After a write, the client reads from the primary for this long.
+REPLICA_PIN_SECONDS = 10
+
+REPLICA_PIN_COOKIE = 'primary_pin'
+
+# Write answers, questions and votes through one writer thread per process, in batched
+# transactions (questions/writes.py).
+WRITE_QUEUE = os.environ.get('RIDDLE_WRITE_QUEUE') == '1'
+
+WRITE_QUEUE_BATCH = 32
+
+# Seconds the writer waits for more writes to batch with the first one.
+WRITE_QUEUE_LINGER = 0.002
+
+
+# Sessions are read from the cache and only fall back to the database on a miss.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# The first backend caches the logged-in user with their profile (questions/auth.py),
+# the second keeps sessions started before it working.
+AUTHENTICATION_BACKENDS = [
+    'questions.auth.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+USER_CACHE_TIMEOUT = 5 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -125,6 +175,87 @@ STATIC_URL = 'static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic compiles the SCSS, minifies, hashes and precompresses (questions/staticfiles.py).
+STATICFILES_STORAGE = 'questions.staticfiles.PipelineStorage'
+
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    'questions.staticfiles.ScssFinder',
+]
+
+SCSS_BUILD_DIR = BASE_DIR / 'build' / 'scss'
+
+# Seconds browsers keep the hashed files, and the few referenced by their own name.
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
+STATIC_UNHASHED_MAX_AGE = 60
+
+MEDIA_URL = 'media/'
+
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Sizes in CSS pixels the cards show avatars at, see questions/avatars.py.
+AVATAR_SIZES = (40, 90)
+
+AVATAR_THUMBNAILS_DIR = 'avatars/thumbnails'
+
+# Sidebar widgets cache (questions/sidebar.py)
+
+SIDEBAR_CACHE_TTL = 60
+
+# Refreshed synchronously under the test runner: a thread of its own would race the
+# test database.
+SIDEBAR_CACHE_BACKGROUND = sys.argv[1:2] != ['test']
+
+# Versioned page and card caches (questions/caching.py). Versions live in the cache
+# itself, so several worker processes need a shared backend such as
+# django.core.cache.backends.filebased.FileBasedCache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'riddle',
+    }
+}
+
+PAGE_CACHE_TIMEOUT = 60
+
+# The read-only JSON API (questions/api.py). Its responses are the same for everyone, so
+# proxies and CDNs may keep them for API_MAX_AGE seconds.
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_MAX_AGE = 30
+
+# Per-request metrics (questions/metrics.py): a view running more queries than its
+# budget logs its slowest ones to the 'questions.metrics' logger.
+REQUEST_METRICS_WINDOW = 1000
+
+QUERY_BUDGET_DEFAULT = 20
+
+QUERY_BUDGETS = {
+    'questions:index': 8,
+    'questions:hot_list': 8,
+    'questions:list_with_tag': 8,
+    'questions:question': 10,
+}
+
+QUERY_BUDGET_LOG_SLOWEST = 5
+
+# Serve the feed and question pages with the async views (set by Riddle/asgi.py).
+ASYNC_VIEWS = os.environ.get('RIDDLE_ASYNC_VIEWS') == '1'
+
+# Push new answers and votes to the open question pages. The event stream is only
+# served under ASGI (Riddle/asgi.py, questions/live.py).
+LIVE_UPDATES = ASYNC_VIEWS
+
+# Seconds between keep-alive comments of an idle event stream.
+LIVE_KEEPALIVE = 15
+
+# Events queued for one slow client before it is disconnected.
+LIVE_BACKLOG = 100
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
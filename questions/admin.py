@@ -1,8 +1,19 @@
 from django.contrib import admin
-from questions.models import Question, Answer, Profile, Tag, Reputation
+from questions.models import Question, Answer, Profile, Tag, Reputation, QuestionTag
+
+
+class QuestionTagInline(admin.TabularInline):
+    model = QuestionTag
+    exclude = ['pub_date']
+    extra = 1
+
+
+class QuestionAdmin(admin.ModelAdmin):
+    inlines = [QuestionTagInline]
+
 
 admin.site.register(Profile)
-admin.site.register(Question)
+admin.site.register(Question, QuestionAdmin)
 admin.site.register(Answer)
 admin.site.register(Tag)
-admin.site.register(Reputation)
\ No newline at end of file
+admin.site.register(Reputation)
@@ -0,0 +1,191 @@
+from collections import defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Count
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET
+
+from questions.caching import cache_public
+from questions.conditional import conditional
+from questions.models import Question, Answer, QuestionTag, Tag
+from questions.pagination import CursorPaginator
+from questions.routers import read_from_replica
+
+# Read-only JSON for the mobile client and edge caches. Rows come straight out of values()
+# querysets and are only renamed into dicts: no model instance is built on the way.
+
+JSON_OPTIONS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class Serializer:
+    # `columns` maps the API fields to values() columns or to expressions annotated only
+    # when asked for, `related` to functions loading a field for many rows in one query.
+
+    def __init__(self, columns, default, related=None):
+        self.columns = columns
+        self.default = default
+        self.related = related or {}
+
+    def fields(self, request, parameter='fields'):
+        value = request.GET.get(parameter)
+        if not value:
+            return self.default
+        fields = list(dict.fromkeys(value.split(',')))
+        unknown = [field for field in fields if field not in self.columns and field not in self.related]
+        if unknown:
+            raise ApiError(f'Неизвестные поля {parameter}: {", ".join(unknown)}')
+        return fields
+
+    def serialize(self, queryset, fields):
+        columns = {field: self.columns[field] for field in fields if field in self.columns}
+        annotations = {field: column for field, column in columns.items() if not isinstance(column, str)}
+        names = {field: field if field in annotations else column for field, column in columns.items()}
+        rows = list(queryset.annotate(**annotations).values('id', *dict.fromkeys(names.values())))
+        related = {field: self.related[field]([row['id'] for row in rows])
+                   for field in fields if field in self.related}
+        return [{field: row[names[field]] if field in names else related[field].get(row['id'], [])
+                 for field in fields} for row in rows]
+
+
+def question_tags(question_ids):
+    tags = defaultdict(list)
+    for question_id, name in (QuestionTag.objects.filter(question_id__in=question_ids)
+                              .order_by('question_id', 'tag_id').values_list('question_id', 'tag__name')):
+        tags[question_id].append(name)
+    return tags
+
+
+QUESTION = Serializer(
+    columns={
+        'id': 'id',
+        'title': 'title',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'author': 'profile__user__username',
+        'rating': 'rating',
+        'likes_count': 'likes_count',
+        'dislikes_count': 'dislikes_count',
+        'answers_count': Count('answer'),
+    },
+    related={'tags': question_tags},
+    default=['id', 'title', 'pub_date', 'author', 'rating', 'likes_count', 'dislikes_count', 'answers_count', 'tags'],
+)
+
+ANSWER = Serializer(
+    columns={
+        'id': 'id',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'author': 'profile__user__username',
+        'correct': 'correct',
+        'rating': 'rating',
+        'likes_count': 'likes_count',
+        'dislikes_count': 'dislikes_count',
+    },
+    default=['id', 'text', 'pub_date', 'author', 'correct', 'rating', 'likes_count', 'dislikes_count'],
+)
+
+
+def page_size(request):
+    value = request.GET.get('limit', '')
+    if not value:
+        return settings.API_PAGE_SIZE
+    if not value.isdigit() or not 1 <= int(value) <= settings.API_MAX_PAGE_SIZE:
+        raise ApiError(f'limit должен быть от 1 до {settings.API_MAX_PAGE_SIZE}')
+    return int(value)
+
+
+def paginate(request, queryset, serializer, fields):
+    paginator = CursorPaginator(queryset, page_size(request))
+    cursor = request.GET.get('cursor')
+    if cursor and paginator.decode(cursor) is None:
+        raise ApiError('Неверный cursor')
+    page = paginator.page(cursor)
+    return {
+        'results': serializer.serialize(page.object_list, fields),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def api_view(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            data = view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'error': error.message}, status=error.status, json_dumps_params=JSON_OPTIONS)
+        return JsonResponse(data, json_dumps_params=JSON_OPTIONS)
+    return wrapper
+
+
+def cache_found(view):
+    # Edge caches may keep the responses for API_MAX_AGE, but not the errors.
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            patch_cache_control(response, public=True, max_age=settings.API_MAX_AGE)
+        return response
+    return wrapper
+
+
+@require_GET
+@cache_found
+@conditional('feeds', public=True)
+@cache_public('feeds')
+@read_from_replica
+@api_view
+def new_questions(request):
+    return paginate(request, Question.objects.new(), QUESTION, QUESTION.fields(request))
+
+
+@require_GET
+@cache_found
+@conditional('feeds', public=True)
+@cache_public('feeds')
+@read_from_replica
+@api_view
+def hot_questions(request):
+    return paginate(request, Question.objects.hot(), QUESTION, QUESTION.fields(request))
+
+
+@require_GET
+@cache_found
+@conditional('feeds', public=True)
+@cache_public('feeds')
+@read_from_replica
+@api_view
+def tag_questions(request, tag: str):
+    tag_id = Tag.objects.id_for_name(tag)
+    if tag_id is None:
+        raise ApiError('Тег не найден', status=404)
+    return paginate(request, Question.objects.by_tag_id(tag_id), QUESTION, QUESTION.fields(request))
+
+
+@require_GET
+@cache_found
+@conditional('question:{id}', public=True)
+@cache_public('question:{id}')
+@read_from_replica
+@api_view
+def question(request, id: int):
+    # The cursor pages through the answers, the question comes with every page.
+    fields = QUESTION.fields(request)
+    answer_fields = ANSWER.fields(request, 'answer_fields')
+    questions = QUESTION.serialize(Question.objects.by_id(id), fields)
+    if not questions:
+        raise ApiError('Вопрос не найден', status=404)
+    return {
+        'question': questions[0],
+        'answers': paginate(request, Answer.objects.by_question(id), ANSWER, answer_fields),
+    }
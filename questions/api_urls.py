@@ -0,0 +1,12 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('questions/', api.new_questions, name='new'),
+    path('questions/hot/', api.hot_questions, name='hot'),
+    path('questions/<int:id>/', api.question, name='question'),
+    path('tags/<str:tag>/questions/', api.tag_questions, name='tag'),
+]
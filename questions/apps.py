@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class QuestionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'questions'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+        from questions import signals  # noqa: F401
+        from questions.metrics import instrument_connection
+        from questions.writes import configure_sqlite
+        from questions.search import recreate_triggers
+
+        connection_created.connect(instrument_connection)
+        connection_created.connect(configure_sqlite)
+        post_migrate.connect(recreate_triggers, sender=self)
+
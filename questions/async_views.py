@@ -0,0 +1,120 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+from django.core.paginator import Paginator
+from django.http import Http404, HttpResponseNotAllowed
+from django.db.models import Count
+
+from questions.models import Question, Answer, QuestionTag
+from questions.forms import AnswerForm
+from questions.sidebar import sidebar
+from questions.routers import read_from_replica
+from questions.live import events_url
+from questions.writes import awrite
+from questions.auth import get_profile, login_redirect
+from questions.caching import cache_anonymous, acard_versions
+from questions.conditional import conditional
+from questions.pagination import CursorPaginator
+from questions.views import question_card, answer_card, feed_page_number
+
+# Async twins of the read views, routed instead of the sync ones under ASGI (see Riddle/asgi.py).
+# The sidebar and the page queries of a request are awaited together.
+
+async def auser(request):
+    # Loads the session and the user off the event loop before templates touch request.user.
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+def with_card_data(question_list):
+    return question_list.select_related('profile__user').annotate(count_answers=Count('answer'))
+
+async def question_instance(question_list):
+    return await question_cards([question async for question in with_card_data(question_list).aiterator()])
+
+async def question_cards(questions):
+    # prefetch_related() does not work with aiterator(), so the tags come in one query of their own.
+    tags = {}
+    async for link in QuestionTag.objects.filter(question__in=[question.id for question in questions]) \
+            .select_related('tag').order_by('tag_id').aiterator():
+        tags.setdefault(link.question_id, []).append(link.tag)
+    card_version = await acard_versions('question', [(question.id, question.profile_id) for question in questions])
+    return [question_card(question, tags.get(question.id, []), card_version[question.id]) for question in questions]
+
+async def answers_instance(answer_list):
+    answers = [answer async for answer in answer_list.select_related('profile__user').aiterator()]
+    card_version = await acard_versions('answer', [(answer.id, answer.profile_id) for answer in answers])
+    return [answer_card(answer, card_version[answer.id]) for answer in answers]
+
+async def paginate(object_list, request, per_page=5, instance=None):
+    items_paginator = Paginator(object_list, per_page)
+    items_paginator.count = await object_list.acount()
+    page = items_paginator.get_page(request.GET.get('page'))
+    if instance is not None:
+        page.object_list = await instance(page.object_list)
+    return page
+
+async def paginate_feed(question_list, request, per_page=5):
+    page = await CursorPaginator(question_list, per_page).apage(request.GET.get('cursor'), feed_page_number(request))
+    page.object_list = await question_instance(page.object_list)
+    return page
+
+async def render_feed(request, question_list):
+    template = 'questions/index.html'
+    _, sidebar_context, page = await asyncio.gather(
+        auser(request), sidebar.aget(), paginate_feed(question_list, request))
+    context = {
+        **sidebar_context,
+        'page_obj': page,
+    }
+    return render(request, template, context)
+
+@conditional('feeds')
+@cache_anonymous('feeds')
+@read_from_replica
+async def index(request):
+    return await render_feed(request, Question.objects.new())
+
+@conditional('feeds')
+@cache_anonymous('feeds')
+@read_from_replica
+async def tag(request, tag: str):
+    return await render_feed(request, await Question.objects.aby_tag(tag))
+
+@conditional('feeds')
+@cache_anonymous('feeds')
+@read_from_replica
+async def hot(request):
+    return await render_feed(request, Question.objects.hot())
+
+@conditional('question:{id}')
+@cache_anonymous('question:{id}')
+@read_from_replica
+async def question(request, id: int):
+    if request.method not in ('GET', 'POST'):
+        return HttpResponseNotAllowed(['GET', 'POST'])
+    template = 'questions/question.html'
+    await auser(request)
+    if request.method == 'GET':
+        answer_form = AnswerForm()
+    if request.method == 'POST':
+        if await sync_to_async(get_profile)(request) is None:
+            return login_redirect(request)
+        answer_form = AnswerForm(data=request.POST)
+        if await sync_to_async(answer_form.is_valid)():
+            await awrite(answer_form.save, request, id)
+    try:
+        question, sidebar_context, page = await asyncio.gather(
+            with_card_data(Question.objects.by_id(id)).aget(), sidebar.aget(),
+            paginate(Answer.objects.by_question(id), request, instance=answers_instance))
+    except Question.DoesNotExist:
+        raise Http404
+    context = {
+        'form': answer_form,
+        'question': (await question_cards([question]))[0],
+        **sidebar_context,
+        'page_obj': page,
+        'closed': False,
+        'events_url': events_url(id),
+    }
+    return render(request, template, context)
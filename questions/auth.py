@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
+
+from questions.models import Profile
+
+UserModel = get_user_model()
+
+
+def user_cache_key(user_id):
+    return f'auth-user-fields:{user_id}'
+
+
+# What the cache keeps of a user: every field but the password hash. The hash of the
+# session is stored instead, it is all a request needs to check the session.
+USER_FIELDS = [field.attname for field in UserModel._meta.concrete_fields if field.attname != 'password']
+PROFILE_FIELDS = [field.attname for field in Profile._meta.concrete_fields]
+
+
+def user_entry(user):
+    try:
+        profile = [getattr(user.profile, name) for name in PROFILE_FIELDS]
+    except Profile.DoesNotExist:
+        profile = None
+    return {'db': user._state.db, 'user': [getattr(user, name) for name in USER_FIELDS], 'profile': profile,
+            'session_hash': user.get_session_auth_hash()}
+
+
+def entry_user(entry):
+    # The password stays deferred: saving this user can't overwrite it.
+    user = UserModel.from_db(entry['db'], USER_FIELDS, entry['user'])
+    user.get_session_auth_hash = lambda: entry['session_hash']
+    if entry['profile'] is None:
+        user._state.fields_cache['profile'] = None
+    else:
+        user.profile = Profile.from_db(entry['db'], PROFILE_FIELDS, entry['profile'])
+    return user
+
+
+class CachedModelBackend(ModelBackend):
+    # The logged-in user and their profile, joined in one query and then kept in the
+    # cache: with the cached_db sessions a warm page view runs no auth query at all.
+    # Saving the user or the profile drops the entry (questions/signals.py). The profile
+    # counters are kept up to date with update(), so the cached copy can lag behind them.
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        entry = cache.get(key)
+        if entry is None:
+            user = UserModel._default_manager.select_related('profile').filter(pk=user_id).first()
+            if user is None:
+                return None
+            entry = user_entry(user)
+            cache.set(key, entry, settings.USER_CACHE_TIMEOUT)
+        user = entry_user(entry)
+        return user if self.user_can_authenticate(user) else None
+
+
+def get_profile(request):
+    # The Profile of the logged-in user, None for the anonymous and for users without one.
+    # Loaded on first use together with request.user.
+    if not hasattr(request, '_cached_profile'):
+        request._cached_profile = None
+        if request.user.is_authenticated:
+            try:
+                request._cached_profile = request.user.profile
+            except Profile.DoesNotExist:
+                pass
+    return request._cached_profile
+
+
+def login_redirect(request):
+    return redirect_to_login(request.get_full_path(), 'questions:sign_in', 'continue')
@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import io
+import logging
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from questions.caching import bump_now
+from questions.models import Profile
+from questions.signals import profile_pages
+
+logger = logging.getLogger('questions.avatars')
+
+# The cards show avatars at a few fixed sizes: every avatar is cropped to each of them
+# (and twice that for dense screens) as WebP and JPEG, next to the uploaded file.
+FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 6}),
+           'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True})}
+
+# One thread, so a burst of uploads doesn't compete with the requests for the CPU.
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='avatars')
+
+
+def variant_sizes():
+    return sorted({scale * size for size in settings.AVATAR_SIZES for scale in (1, 2)})
+
+
+def open_source(name):
+    # fill_db points the avatars at the static images, uploads live in the media storage.
+    static_prefix = '/' + settings.STATIC_URL.lstrip('/')
+    if name.startswith(static_prefix):
+        path = finders.find(name[len(static_prefix):])
+        if path is None:
+            raise FileNotFoundError(name)
+        return open(path, 'rb')
+    return default_storage.open(name, 'rb')
+
+
+def make_variants(name):
+    # Variants are named after the content, so profiles sharing an image share them too
+    # and a finished set is never rendered again.
+    with open_source(name) as source:
+        content = source.read()
+    prefix = f'{settings.AVATAR_THUMBNAILS_DIR}/{hashlib.md5(content).hexdigest()[:16]}'
+    missing = [(size, extension) for size in variant_sizes() for extension in FORMATS
+               if not default_storage.exists(f'{prefix}-{size}.{extension}')]
+    if missing:
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(content))).convert('RGB')
+        for size, extension in missing:
+            image_format, options = FORMATS[extension]
+            output = io.BytesIO()
+            ImageOps.fit(image, (size, size), Image.LANCZOS).save(output, image_format, **options)
+            default_storage.save(f'{prefix}-{size}.{extension}', ContentFile(output.getvalue()))
+    return prefix
+
+
+def thumbnail_avatars(name):
+    prefix = make_variants(name)
+    # Only the profiles still showing this avatar, it may have been replaced meanwhile.
+    profile_ids = list(Profile.objects.filter(avatar=name).exclude(avatar_thumbnail=prefix)
+                       .values_list('id', flat=True))
+    Profile.objects.filter(id__in=profile_ids).update(avatar_thumbnail=prefix)
+    # The feeds and question pages show the avatar too, not only the card fragments.
+    bump_now(*{name for id in profile_ids for name in profile_pages(id)})
+    return profile_ids
+
+
+def thumbnail_in_background(name):
+    def run():
+        try:
+            thumbnail_avatars(name)
+        except Exception:
+            logger.exception('Could not make the thumbnails of %s', name)
+    return executor.submit(run)
+
+
+def set_avatar(profile, upload):
+    # The original is kept and shown until the thumbnails are ready.
+    profile.avatar = upload
+    profile.avatar_thumbnail = ''
+    profile.save(update_fields=['avatar', 'avatar_thumbnail'])
+    name = profile.avatar.name
+    transaction.on_commit(lambda: thumbnail_in_background(name))
@@ -0,0 +1,140 @@
+from functools import wraps
+import asyncio
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_PREFIX = 'version:'
+MODIFIED_PREFIX = 'modified:'
+
+
+def markers(keys, start):
+    # A marker that is missing or evicted restarts from the clock, so a version never
+    # goes back to a value some stale entry is still stored under.
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, start(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+async def amarkers(keys, start):
+    found = await cache.aget_many(keys)
+    for key in keys:
+        if key not in found:
+            await cache.aadd(key, start(), None)
+            found[key] = await cache.aget(key)
+    return [found[key] for key in keys]
+
+
+def versions(names):
+    return markers([VERSION_PREFIX + name for name in names], time.time_ns)
+
+
+async def aversions(names):
+    return await amarkers([VERSION_PREFIX + name for name in names], time.time_ns)
+
+
+def last_modified(names):
+    # When the latest of `names` changed, as a timestamp (Last-Modified headers).
+    return max(markers([MODIFIED_PREFIX + name for name in names], time.time))
+
+
+async def alast_modified(names):
+    return max(await amarkers([MODIFIED_PREFIX + name for name in names], time.time))
+
+
+def bump_now(*names):
+    for name in names:
+        try:
+            cache.incr(VERSION_PREFIX + name)
+        except ValueError:
+            pass
+    cache.set_many({MODIFIED_PREFIX + name: time.time() for name in names}, None)
+
+
+def bump(*names):
+    # After the commit, so a reader can't store data older than the version it saw.
+    transaction.on_commit(lambda: bump_now(*names))
+
+
+def card_version_names(kind, objects):
+    # Cards render the author too, so their fragments follow the profile version as well.
+    return [f'{kind}:{id}' for id, profile_id in objects] + [f'profile:{profile_id}' for id, profile_id in objects]
+
+
+def card_version_map(objects, found):
+    return {id: f'{found[i]}.{found[i + len(objects)]}' for i, (id, profile_id) in enumerate(objects)}
+
+
+def card_versions(kind, objects):
+    return card_version_map(objects, versions(card_version_names(kind, objects)))
+
+
+async def acard_versions(kind, objects):
+    return card_version_map(objects, await aversions(card_version_names(kind, objects)))
+
+
+def page_cache_key(request, page_versions):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:{path}:' + '.'.join(map(str, page_versions))
+
+
+def is_cacheable(response):
+    return response.status_code == 200 and not response.cookies
+
+
+def cache_anonymous(*names):
+    # Serves logged-out GETs from the cache, keyed by the full path and the versions
+    # of what the page shows, e.g. @cache_anonymous('question:{id}').
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if (request.method not in ('GET', 'HEAD')
+                        or await sync_to_async(lambda: request.user.is_authenticated)()):
+                    return await view(request, *args, **kwargs)
+                key = page_cache_key(request, await aversions([name.format(**kwargs) for name in names]))
+                response = await cache.aget(key)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                    if is_cacheable(response):
+                        await cache.aset(key, response, settings.PAGE_CACHE_TIMEOUT)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            return cached_response(request, names, lambda: view(request, *args, **kwargs), kwargs)
+        return wrapper
+    return decorator
+
+
+def cache_public(*names):
+    # For responses that are the same for every user (the JSON API): cached for all of
+    # them, without looking at the session.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            return cached_response(request, names, lambda: view(request, *args, **kwargs), kwargs)
+        return wrapper
+    return decorator
+
+
+def cached_response(request, names, render, kwargs):
+    key = page_cache_key(request, versions([name.format(**kwargs) for name in names]))
+    response = cache.get(key)
+    if response is None:
+        response = render()
+        if is_cacheable(response):
+            cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+    return response
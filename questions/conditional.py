@@ -0,0 +1,79 @@
+from functools import wraps
+import asyncio
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from questions.caching import versions, aversions, last_modified, alast_modified
+from questions.sidebar import sidebar
+
+# Conditional GETs for the feeds, the question pages and the API. The validators come from
+# the cache versions and modification times that the signals already keep up to date, so
+# a reload of an unchanged page is answered with a 304 before the view runs any query.
+# The authors shown on a page aren't known before it is rendered, so a changed name or
+# avatar bumps the names of the pages showing them instead (questions/signals.py).
+
+
+def page_state(request):
+    # What else a page shows: the sidebar, and who is logged in. The CSRF token of logged-in
+    # users is embedded in the page and changes at login, so it is part of their ETag.
+    user = request.user
+    who = f'{user.pk}:{request.META.get("CSRF_COOKIE", "")}' if user.is_authenticated else 'anonymous'
+    return [sidebar.version, who], sidebar.changed
+
+
+def validators(request, public, page_versions, modified):
+    state, changed = ([], 0) if public else page_state(request)
+    etag = 'W/"%s"' % hashlib.md5('.'.join(map(str, page_versions + state)).encode()).hexdigest()[:20]
+    # Last-Modified can't tell a login apart, so pages of logged-in users only have the ETag.
+    if not public and request.user.is_authenticated:
+        return etag, None
+    # Last-Modified has whole seconds: a change later in the same second would keep the value
+    # a client already has. Until that second is over, the ETag goes alone.
+    modified = int(max(modified, changed))
+    return etag, modified if modified < int(time.time()) else None
+
+
+def finish(response, etag, modified):
+    if response.status_code in (200, 304):
+        if modified is not None and not response.has_header('Last-Modified'):
+            response['Last-Modified'] = http_date(modified)
+        response.headers.setdefault('ETag', etag)
+    return response
+
+
+def conditional(*names, public=False):
+    # @conditional('question:{id}') in front of the views cached with the same names;
+    # public for responses that are the same for everyone (the API).
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view(request, *args, **kwargs)
+                if not public:
+                    await sync_to_async(lambda: request.user.is_authenticated)()
+                page_names = [name.format(**kwargs) for name in names]
+                etag, modified = validators(request, public, await aversions(page_names),
+                                            await alast_modified(page_names))
+                response = get_conditional_response(request, etag=etag, last_modified=modified)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return finish(response, etag, modified)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            page_names = [name.format(**kwargs) for name in names]
+            etag, modified = validators(request, public, versions(page_names), last_modified(page_names))
+            response = get_conditional_response(request, etag=etag, last_modified=modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return finish(response, etag, modified)
+        return wrapper
+    return decorator
@@ -6,7 +6,10 @@ from django.core.validators import validate_email
 from django.forms import CharField
 
 from django.contrib.auth.models import User
+from django.db import transaction
 from questions.models import Profile, Question, Tag, Answer
+from questions.avatars import set_avatar
+from questions.auth import get_profile
 
 class RegistrationForm(forms.ModelForm):
     email = forms.EmailField(widget=forms.EmailInput(), label='Почта:', required=True)
@@ -60,8 +63,7 @@ class RegistrationForm(forms.ModelForm):
 
         profile = Profile.objects.create(user=user)
         if avatar:
-            profile.avatar = avatar
-        profile.save()
+            set_avatar(profile, avatar)
         return profile
 
 class LoginForm(forms.Form):
@@ -77,17 +79,13 @@ class QuestionForm(forms.ModelForm):
         model = Question
         fields = ['title', 'tags', 'text']
 
+    @transaction.atomic
     def save(self, request, **kwargs):
         quest = super().save(commit=False)
-        quest.profile = Profile.objects.get(user=request.user)
+        quest.profile = get_profile(request)
         quest.save()
 
-        tags = self.cleaned_data['tags']
-        tag_list = tags.split()
-        for tag in tag_list:
-            quest.tags.add(Tag.objects.get_or_create(name=tag)[0].id)
-
-        quest.save()
+        Tag.objects.attach([(quest, self.cleaned_data['tags'].split())])
         return quest
 
 class AnswerForm(forms.ModelForm):
@@ -97,9 +95,10 @@ class AnswerForm(forms.ModelForm):
         model = Answer
         fields = ['text']
 
+    @transaction.atomic
     def save(self, request, q_id: int, **kwargs):
         answer = super().save(commit=False)
-        answer.profile = Profile.objects.get(user=request.user)
+        answer.profile = get_profile(request)
         answer.question = Question.objects.by_id(q_id)[0]
         answer = super().save()
         
@@ -113,9 +112,12 @@ class SettingsForm(forms.ModelForm):
     first_name = forms.CharField(widget=forms.TextInput(), min_length=1, label='Имя:', required=False)
     last_name = forms.CharField(widget=forms.TextInput(), min_length=1, label='Фамилия:', required=False)
 
+    # The password fields are not filled from the user: its hash isn't loaded for the page.
+    field_order = ['email', 'username', 'password', 'password_check', 'first_name', 'last_name']
+
     class Meta:
         model = User
-        fields = ['email', 'username', 'password', 'password_check', 'first_name', 'last_name']
+        fields = ['email', 'username', 'first_name', 'last_name']
 
         labels = {
             'username': 'Логин:'
@@ -133,3 +135,10 @@ class SettingsForm(forms.ModelForm):
             self.add_error('password_check', 'Пароли не совпадают')
 
         return self.cleaned_data
+
+    def save(self, **kwargs):
+        # Only the avatar is stored on the profile, saving it whole would put back the
+        # counters of the cached copy.
+        if self.cleaned_data.get('avatar'):
+            set_avatar(self.instance, self.cleaned_data['avatar'])
+        return self.instance
@@ -0,0 +1,172 @@
+from collections import defaultdict, deque
+import asyncio
+import json
+import re
+import threading
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from questions.models import Question, Answer
+
+# New answers and vote counts of a question, pushed to its open pages as server-sent
+# events. The stream is served by Riddle/asgi.py next to Django: an idle viewer costs
+# a coroutine and a subscription, and every event is rendered once for all of them.
+
+EVENTS_PATH = re.compile(r'^/question/(\d+)/events/$')
+
+
+def events_path(question_id):
+    return f'/question/{question_id}/events/'
+
+
+def events_url(question_id):
+    return events_path(question_id) if settings.LIVE_UPDATES else None
+
+
+class Overflow(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, backlog):
+        self.loop = asyncio.get_running_loop()
+        self.backlog = backlog
+        self.events = deque()
+        self.overflowed = False
+        self.ready = asyncio.Event()
+
+    def put(self, event):
+        # A client too slow to keep up is disconnected, EventSource reconnects it.
+        if len(self.events) >= self.backlog:
+            self.overflowed = True
+        else:
+            self.events.append(event)
+        self.ready.set()
+
+    async def get(self, timeout):
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        if self.overflowed:
+            raise Overflow
+        self.ready.clear()
+        events = list(self.events)
+        self.events.clear()
+        return events
+
+
+class Hub:
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def watching(self, question_id):
+        return bool(self._subscriptions.get(question_id))
+
+    def subscribe(self, question_id):
+        subscription = Subscription(settings.LIVE_BACKLOG)
+        with self._lock:
+            self._subscriptions[question_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, question_id, subscription):
+        with self._lock:
+            self._subscriptions[question_id].discard(subscription)
+            if not self._subscriptions[question_id]:
+                del self._subscriptions[question_id]
+
+    def publish(self, question_id, name, data):
+        # Called from any thread, after the commit. One callback per event loop fans the
+        # event out to the subscriptions living on it.
+        event = f'event: {name}\ndata: {json.dumps(data)}\n\n'.encode()
+        with self._lock:
+            loops = {subscription.loop for subscription in self._subscriptions.get(question_id, ())}
+        for loop in loops:
+            loop.call_soon_threadsafe(self._deliver, loop, question_id, event)
+
+    def _deliver(self, loop, question_id, event):
+        with self._lock:
+            subscriptions = [subscription for subscription in self._subscriptions.get(question_id, ())
+                             if subscription.loop is loop]
+        for subscription in subscriptions:
+            subscription.put(event)
+
+
+hub = Hub()
+
+
+def publish_answer(answer):
+    if not hub.watching(answer.question_id):
+        return
+    from questions.views import answers_instance
+    card = answers_instance(Answer.objects.filter(id=answer.id))[0]
+    hub.publish(answer.question_id, 'answer',
+                {'id': answer.id, 'html': render_to_string('includes/answer-card.html', {'answer': card})})
+
+
+def publish_votes(model, object_id, question_ids):
+    question_ids = [id for id in question_ids if hub.watching(id)]
+    if not question_ids:
+        return
+    counts = model.objects.filter(id=object_id).values('likes_count', 'dislikes_count', 'rating').first()
+    if counts is None:
+        return
+    url = reverse(f'questions:{model._meta.model_name}_vote', args=[object_id])
+    for question_id in question_ids:
+        hub.publish(question_id, 'votes', {'url': url, **counts})
+
+
+async def stream(question_id, receive, send):
+    if not await Question.objects.filter(id=question_id).aexists():
+        await send({'type': 'http.response.start', 'status': 404, 'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b'Not Found'})
+        return
+
+    subscription = hub.subscribe(question_id)
+    disconnected = asyncio.Event()
+
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+        subscription.ready.set()
+
+    watcher = asyncio.create_task(wait_for_disconnect())
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+        while not disconnected.is_set():
+            try:
+                events = await subscription.get(settings.LIVE_KEEPALIVE)
+            except Overflow:
+                break
+            if disconnected.is_set():
+                break
+            # A comment line keeps proxies from closing an idle stream.
+            await send({'type': 'http.response.body', 'body': b''.join(events) or b': keep-alive\n\n',
+                        'more_body': True})
+        if not disconnected.is_set():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        watcher.cancel()
+        hub.unsubscribe(question_id, subscription)
+
+
+def events_application(application):
+    async def route(scope, receive, send):
+        match = EVENTS_PATH.match(scope['path']) if scope['type'] == 'http' else None
+        if match is None:
+            return await application(scope, receive, send)
+        if scope['method'] != 'GET':
+            await send({'type': 'http.response.start', 'status': 405, 'headers': [(b'allow', b'GET')]})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        await stream(int(match[1]), receive, send)
+    return route
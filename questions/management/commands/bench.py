@@ -0,0 +1,155 @@
+from urllib.parse import quote, urlencode
+import json
+import random
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils.crypto import get_random_string
+
+from questions.management import loadgen
+from questions.metrics import percentiles
+from questions.models import Question, Answer, Tag, Profile
+
+DEFAULT_MIX = 'feed=40,tag=20,question=25,vote=10,answer=5'
+KINDS = ('feed', 'tag', 'question', 'vote', 'answer')
+
+
+class Command(BaseCommand):
+    help = 'Load-test Riddle with a mix of page views, votes and answers from concurrent clients ' \
+           '(votes and answers are written to the database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ratio', type=int, help='Seed the database with fill_db at this ratio first')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--clients', type=int, default=16, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Weights of the request kinds, default {DEFAULT_MIX}')
+        parser.add_argument('--interface', choices=('wsgi', 'asgi', 'http'), default='wsgi')
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Server to load with --interface http')
+        parser.add_argument('--anonymous', action='store_true', help='Send page views without a session')
+        parser.add_argument('--json', help='Write the report as JSON to this file, - for stdout')
+
+    def handle(self, **options):
+        if options['interface'] == 'asgi' and not settings.ASYNC_VIEWS:
+            raise CommandError('Set RIDDLE_ASYNC_VIEWS=1 to serve the async views in-process under ASGI')
+        mix = self.parse_mix(options['mix'])
+        if options['ratio']:
+            call_command('fill_db', ratio=options['ratio'], seed=options['seed'], stdout=self.stderr)
+
+        if options['interface'] == 'http':
+            self.check_server(options['url'])
+        requests = self.plan(mix, options)
+        started = time.perf_counter()
+        results = loadgen.run(options['interface'], requests, options['clients'], options['url'])
+        elapsed = time.perf_counter() - started
+
+        report = {
+            'commit': self.commit(),
+            'options': {key: options[key] for key in
+                        ('ratio', 'seed', 'clients', 'requests', 'mix', 'interface', 'anonymous')},
+            'elapsed': round(elapsed, 3),
+            'endpoints': {kind: self.summary([result for result in results if result.request.kind == kind], elapsed)
+                          for kind in KINDS if mix.get(kind)},
+            'total': self.summary(results, elapsed),
+        }
+        if options['json'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        if options['json']:
+            with open(options['json'], 'w') as file:
+                json.dump(report, file, indent=2)
+        self.print_report(report)
+
+    def parse_mix(self, value):
+        try:
+            mix = {kind: int(weight) for kind, weight in (part.split('=') for part in value.split(','))}
+        except ValueError:
+            raise CommandError(f'--mix must look like {DEFAULT_MIX}')
+        if not set(mix) <= set(KINDS) or sum(mix.values()) <= 0:
+            raise CommandError(f'--mix kinds are {", ".join(KINDS)}')
+        return mix
+
+    def plan(self, mix, options):
+        rng = random.Random(options['seed'])
+        questions = Question.objects.aggregate(first=Min('id'), last=Max('id'))
+        answers = Answer.objects.aggregate(first=Min('id'), last=Max('id'))
+        tags = list(Tag.objects.top_tags(50).values_list('name', flat=True))
+        users = [profile.user for profile in Profile.objects.select_related('user').order_by('id')[:options['clients']]]
+        if questions['first'] is None or answers['first'] is None or not tags or not users:
+            raise CommandError('The database is empty, run fill_db or pass --ratio')
+
+        # Every client is a logged-in user with a CSRF token of its own, so votes and answers pass.
+        sessions = []
+        for user in users:
+            csrf = get_random_string(32)
+            sessions.append({'Cookie': f'{loadgen.login_cookie(user)}; {settings.CSRF_COOKIE_NAME}={csrf}',
+                             'X-CSRFToken': csrf})
+
+        requests = []
+        for i in range(options['requests']):
+            kind = rng.choices(list(mix), weights=list(mix.values()))[0]
+            headers = rng.choice(sessions)
+            body = {}
+            if kind == 'feed':
+                path = rng.choice(['/', '/hot/']) + rng.choice(['', '?page=2', '?page=3'])
+            elif kind == 'tag':
+                path = f'/tag/{quote(rng.choice(tags))}/'
+            elif kind == 'question':
+                path = f'/question/{rng.randint(questions["first"], questions["last"])}/'
+            elif kind == 'vote':
+                model, bounds = rng.choice([('question', questions), ('answer', answers)])
+                path = f'/{model}/{rng.randint(bounds["first"], bounds["last"])}/vote/'
+                body = {'vote': rng.choice(['like', 'dislike'])}
+            else:
+                path = f'/question/{rng.randint(questions["first"], questions["last"])}/'
+                body = {'text': f'Benchmark answer {i}'}
+            if options['anonymous'] and not body:
+                headers = {}
+            requests.append(loadgen.Request(kind, 'POST' if body else 'GET', path, urlencode(body).encode(), headers))
+        return requests
+
+    def summary(self, results, elapsed):
+        if not results:
+            return {'requests': 0}
+        queries = [result.queries for result in results if result.queries is not None]
+        return {
+            'requests': len(results),
+            'errors': sum(result.status >= 400 for result in results),
+            'rps': round(len(results) / elapsed, 1),
+            'latency_ms': percentiles([result.latency * 1000 for result in results]),
+            'queries': round(sum(queries) / len(queries), 2) if queries else None,
+        }
+
+    def check_server(self, url):
+        # In-process the queries are counted directly; a separate server only reports them
+        # in X-Query-Count, which it sends with DEBUG on.
+        try:
+            [result] = loadgen.run('http', [loadgen.Request('probe', 'GET', '/', b'', {})], 1, url)
+        except OSError as error:
+            raise CommandError(f'Cannot reach {url}: {error}')
+        if result.queries is None:
+            raise CommandError(f'{url} sends no X-Query-Count header, run the server with DEBUG=True')
+
+    def commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  cwd=settings.BASE_DIR).stdout.strip() or None
+        except OSError:
+            return None
+
+    def print_report(self, report):
+        self.stdout.write(f'{report["options"]["requests"]} requests from {report["options"]["clients"]} clients '
+                          f'in {report["elapsed"]:.2f}s ({report["options"]["interface"]}, commit {report["commit"]})')
+        self.stdout.write(f'{"endpoint":<10}{"requests":>9}{"errors":>8}{"req/s":>9}'
+                          f'{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}')
+        for kind, row in [*report['endpoints'].items(), ('total', report['total'])]:
+            if not row['requests']:
+                continue
+            latency = row['latency_ms']
+            queries = '-' if row['queries'] is None else f'{row["queries"]:.1f}'
+            self.stdout.write(f'{kind:<10}{row["requests"]:>9}{row["errors"]:>8}{row["rps"]:>9.1f}'
+                              f'{latency["p50"]:>9.1f}{latency["p95"]:>9.1f}{latency["p99"]:>9.1f}{queries:>9}')
@@ -0,0 +1,77 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Prefetch
+
+from questions import api
+from questions.models import Question, Answer, Tag
+
+
+class Command(BaseCommand):
+    help = 'Time the JSON API serialization of 100 questions and 100 answers (values() rows against ' \
+           'model instances), queries included'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, **options):
+        items, repeat = options['items'], options['repeat']
+        question = Question.objects.annotate(n=Count('answer')).filter(n__gte=1).order_by('-n').first()
+        if question is None or Question.objects.count() < items:
+            raise CommandError(f'Needs at least {items} questions with answers, run fill_db first')
+        answers = Answer.objects.by_question(question.id)
+
+        self.stdout.write(f'{"":<20}{"items":>6}{"values() ms":>13}{"instances ms":>14}{"bytes":>8}')
+        for name, rows, instances in (
+            ('questions', lambda: api.QUESTION.serialize(Question.objects.new()[:items], api.QUESTION.default),
+             lambda: self.question_instances(items)),
+            ('answers', lambda: api.ANSWER.serialize(answers[:items], api.ANSWER.default),
+             lambda: self.answer_instances(answers[:items])),
+        ):
+            rows_ms, size, count = self.measure(rows, repeat)
+            instances_ms, _, _ = self.measure(instances, repeat)
+            self.stdout.write(f'{name:<20}{count:>6}{rows_ms * 100 / count:>13.2f}{instances_ms * 100 / count:>14.2f}'
+                              f'{size:>8}')
+        self.stdout.write('times are medians per 100 items')
+
+    def measure(self, serialize, repeat):
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = serialize()
+            body = json.dumps(data, cls=DjangoJSONEncoder, **api.JSON_OPTIONS).encode()
+            times.append((time.perf_counter() - started) * 1000)
+        return statistics.median(times), len(body), len(data)
+
+    # The straightforward way, for comparison: model instances with their relations.
+
+    def question_instances(self, items):
+        questions = (Question.objects.new().select_related('profile__user').annotate(answers_count=Count('answer'))
+                     .prefetch_related(Prefetch('tags', queryset=Tag.objects.order_by('id')))[:items])
+        return [{
+            'id': question.id,
+            'title': question.title,
+            'pub_date': question.pub_date,
+            'author': question.profile.user.username if question.profile else None,
+            'rating': question.rating,
+            'likes_count': question.likes_count,
+            'dislikes_count': question.dislikes_count,
+            'answers_count': question.answers_count,
+            'tags': [tag.name for tag in question.tags.all()],
+        } for question in questions]
+
+    def answer_instances(self, answers):
+        return [{
+            'id': answer.id,
+            'text': answer.text,
+            'pub_date': answer.pub_date,
+            'author': answer.profile.user.username if answer.profile else None,
+            'correct': answer.correct,
+            'rating': answer.rating,
+            'likes_count': answer.likes_count,
+            'dislikes_count': answer.dislikes_count,
+        } for answer in answers.select_related('profile__user')]
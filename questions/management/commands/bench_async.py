@@ -0,0 +1,74 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from questions.management import loadgen
+from questions.models import Question, Tag, Profile
+
+MODES = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    help = 'Compare throughput of the sync views under WSGI and the async views under ASGI at fixed concurrency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--anonymous', action='store_true', help='Benchmark the cached anonymous pages')
+        parser.add_argument('--mode', choices=MODES, help='Run one side only (used internally)')
+
+    def handle(self, **options):
+        if options['mode']:
+            return self.run(options)
+        # Each side runs in its own process: the URLconf picks the sync or async views at import time.
+        results = {}
+        for mode in MODES:
+            command = [sys.executable, sys.argv[0], 'bench_async', '--mode', mode,
+                       '--concurrency', str(options['concurrency']), '--requests', str(options['requests'])]
+            if options['anonymous']:
+                command.append('--anonymous')
+            env = {**os.environ, 'RIDDLE_ASYNC_VIEWS': str(int(mode == 'asgi'))}
+            output = subprocess.run(command, env=env, capture_output=True, text=True)
+            if output.returncode:
+                raise CommandError(output.stderr)
+            # The last line holds the numbers, whatever the views print before it.
+            results[mode] = [float(value) for value in output.stdout.splitlines()[-1].split()]
+
+        self.stdout.write(f'{options["requests"]} requests, concurrency {options["concurrency"]}')
+        self.stdout.write(f'{"mode":<8}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}')
+        for mode, (rps, p50, p95) in results.items():
+            self.stdout.write(f'{mode:<8}{rps:>10.1f}{p50:>10.1f}{p95:>10.1f}')
+
+    def run(self, options):
+        if settings.ASYNC_VIEWS != (options['mode'] == 'asgi'):
+            raise CommandError('RIDDLE_ASYNC_VIEWS does not match --mode')
+        paths = self.paths()
+        headers = {}
+        if not options['anonymous']:
+            headers['Cookie'] = loadgen.login_cookie(Profile.objects.select_related('user').first().user)
+        requests = [loadgen.Request('page', 'GET', paths[i % len(paths)], b'', headers)
+                    for i in range(options['requests'])]
+
+        started = time.perf_counter()
+        results = loadgen.run(options['mode'], requests, options['concurrency'])
+        elapsed = time.perf_counter() - started
+        for result in results:
+            if result.status != 200:
+                raise CommandError(f'{result.request.path}: {result.status}')
+
+        quantiles = statistics.quantiles([result.latency for result in results], n=20)
+        self.stdout.write(f'{len(requests) / elapsed} {quantiles[9] * 1000} {quantiles[18] * 1000}')
+
+    def paths(self):
+        question = Question.objects.filter(answer__isnull=False).order_by('-id').first()
+        tag = Tag.objects.top_tags(1).first()
+        if question is None or tag is None:
+            raise CommandError('The database is empty, run fill_db first')
+        return [reverse('questions:index'), reverse('questions:hot_list'),
+                reverse('questions:list_with_tag', args=[tag.name]), reverse('questions:question', args=[question.id])]
@@ -1,19 +1,26 @@
+from django.core.cache import cache
 from django.core.management.base import BaseCommand
-from questions.models import Question, Profile, Reputation, Tag, Answer
+from django.contrib.admin.models import LogEntry
 from django.contrib.auth.models import User
+from django.db import router, transaction
+from questions.models import Question, Profile, Reputation, Tag, Answer, QuestionTag
+from questions.sidebar import sidebar
 
+# Children first. The tables are emptied without loading the rows, so none of the per-row
+# receivers (vote and tag counters, profile counters, cache versions, live updates) run.
+MODELS = (QuestionTag, Reputation, Answer, Question, Tag, Profile,
+          User.groups.through, User.user_permissions.through, LogEntry, User)
 
-class Command(BaseCommand):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
 
-    def add_arguments(self, parser):
-        pass
+class Command(BaseCommand):
+    help = 'Delete every user, question, answer, tag and vote'
 
     def handle(self, *args, **options):
-        Question.objects.all().delete()
-        Answer.objects.all().delete()
-        Reputation.objects.all().delete()
-        Profile.objects.all().delete()
-        User.objects.all().delete()
-        Tag.objects.all().delete()
\ No newline at end of file
+        using = router.db_for_write(User)
+        with transaction.atomic(using=using):
+            for model in MODELS:
+                model.objects.all()._raw_delete(using)
+            # Everything cached refers to deleted rows: versions restart from the clock.
+            transaction.on_commit(cache.clear, using=using)
+            transaction.on_commit(sidebar.invalidate, using=using)
+        self.stdout.write('Database cleared')
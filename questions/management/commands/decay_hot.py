@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+import numpy as np
+
+from questions.caching import bump_now
+from questions.models import Question, HOT_ANSWER_WEIGHT, hot_rank
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = ('Recompute the hot_score of every question. The scores do not decay with time, '
+            'votes and answers keep them current: run it after a bulk import or a formula change.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        total = 0
+        while True:
+            ids = list(Question.objects.filter(id__gt=last_id).order_by('id')
+                       .values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            total += self.recompute(Question.objects.filter(id__gte=ids[0], id__lte=ids[-1]))
+            last_id = ids[-1]
+        bump_now('feeds')
+        self.stdout.write(f'{total} questions rescored')
+
+    def recompute(self, chunk):
+        ids, ratings, answers, pub_dates = zip(*Question.objects.hot_score_rows(chunk))
+        published = np.fromiter((pub_date.timestamp() for pub_date in pub_dates), float, len(pub_dates))
+        scores = hot_rank(np.array(ratings) + HOT_ANSWER_WEIGHT * np.array(answers), published)
+        return Question.objects.set_hot_scores(ids, scores.tolist())
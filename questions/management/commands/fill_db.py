@@ -1,9 +1,16 @@
-from django.core.management.base import BaseCommand
-from questions.models import Question, Profile, Tag, Answer, Reputation
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from questions.models import Question, Profile, Tag, Answer, Reputation, QuestionTag
+from questions.management.textgen import generate_chunk
 
-from faker import Faker, exceptions
+from itertools import product
+from multiprocessing import Pool
 import random
+import time
 
 DEFAULT_N_USERS = 1
 DEFAULT_N_QUESTIONS = 10
@@ -11,195 +18,159 @@ DEFAULT_N_ANSWERS = 100
 DEFAULT_N_TAGS = 1
 DEFAULT_N_LIKES = 180
 
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_PASSWORD = 'password'
+
 WORD_LIST = ('cat', 'dog', 'burito', 'vine', 'mems', 'python', 'Go', 'OCaml', 'Haskell', 'anacondaz')
 
 
 class Command(BaseCommand):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.faker = Faker()
+    help = 'Fill the database with a reproducible generated dataset'
 
     def add_arguments(self, parser):
-        parser.add_argument('--ratio', type=int)
+        parser.add_argument('--ratio', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--workers', type=int, default=1, help='Processes generating Faker texts')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password of every generated user')
 
     def handle(self, **options):
-        ratio = int(options['ratio']) if options['ratio'] else 10
-
-        self.users_gen(ratio * DEFAULT_N_USERS)
-        self.tags_gen(ratio * DEFAULT_N_TAGS)
-        self.questions_gen(ratio * DEFAULT_N_QUESTIONS)
-        self.answers_gen(ratio * DEFAULT_N_ANSWERS)
-        self.reputations_gen(ratio * DEFAULT_N_LIKES)
-
-    def users_gen(self, count):
-        print("Users generating...")
-        users = [None] * count
-        profiles = [None] * count
-
-        for i in range(count):
-            user = User(username=self.faker.unique.user_name(), first_name=self.faker.first_name(),
-                        last_name=self.faker.last_name(), email=self.faker.email())
-            user.set_password(raw_password=self.faker.password())
-
-            users[i] = user
-            profiles[i] = Profile(user=user, avatar=f'/static/images/({random.randint(1, 20)}).jpg')
-        User.objects.bulk_create(users)
-        Profile.objects.bulk_create(profiles)
-        print('Success.')
+        ratio = options['ratio']
+        if ratio < 1:
+            raise CommandError('--ratio must be positive')
+        # The generated user and tag names only depend on the seed, a second run would collide.
+        if Profile.objects.exists() or Tag.objects.exists() or Question.objects.exists():
+            raise CommandError('The database already has data, empty it with clear_db first')
+        self.seed = options['seed']
+        self.batch_size = options['batch_size']
+        self.random = random.Random(self.seed)
+        self.report = []
+        self.pool = Pool(options['workers']) if options['workers'] > 1 else None
+        started = time.perf_counter()
+        try:
+            self.users_gen(ratio * DEFAULT_N_USERS, options['password'])
+            self.tags_gen(ratio * DEFAULT_N_TAGS)
+            self.questions_gen(ratio * DEFAULT_N_QUESTIONS)
+            self.answers_gen(ratio * DEFAULT_N_ANSWERS)
+            self.reputations_gen(ratio * DEFAULT_N_LIKES)
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+
+        self.stage('counters', 0, self.counters_gen)
+        self.print_report(time.perf_counter() - started)
+
+    def stage(self, name, rows, func, *args):
+        self.stdout.write(f'{name} generating...')
+        started = time.perf_counter()
+        rows = func(*args) or rows
+        self.report.append((name, rows, time.perf_counter() - started))
+
+    def print_report(self, elapsed):
+        self.stdout.write(f'{"stage":<12}{"rows":>12}{"seconds":>10}{"rows/s":>12}')
+        for name, rows, seconds in self.report:
+            self.stdout.write(f'{name:<12}{rows:>12}{seconds:>10.2f}{rows / max(seconds, 1e-9):>12.0f}')
+        total = sum(rows for name, rows, seconds in self.report)
+        self.stdout.write(self.style.SUCCESS(f'{total} rows in {elapsed:.2f}s ({total / elapsed:.0f} rows/s)'))
+
+    def texts(self, kind, count):
+        tasks = [(kind, random.Random(f'{self.seed}:{kind}:{start}').getrandbits(32), min(self.batch_size, count - start))
+                 for start in range(0, count, self.batch_size)]
+        chunks = self.pool.imap(generate_chunk, tasks) if self.pool is not None else map(generate_chunk, tasks)
+        for chunk in chunks:
+            yield chunk
+
+    def batches(self, model, objects, **kwargs):
+        created = []
+        for start in range(0, len(objects), self.batch_size):
+            created += model.objects.bulk_create(objects[start:start + self.batch_size], **kwargs)
+        return created
+
+    def users_gen(self, count, password):
+        def generate():
+            hashed = make_password(password)
+            number = 0
+            for chunk in self.texts('users', count):
+                users = []
+                for user_name, first_name, last_name, email in chunk:
+                    users.append(User(username=f'{user_name}{number}', first_name=first_name, last_name=last_name,
+                                      email=email, password=hashed))
+                    number += 1
+                with transaction.atomic():
+                    users = User.objects.bulk_create(users)
+                    Profile.objects.bulk_create(
+                        [Profile(user=user, avatar=f'/static/images/({self.random.randint(1, 20)}).jpg')
+                         for user in users])
+            self.profile_ids = list(Profile.objects.order_by('id').values_list('id', flat=True))
+
+        self.stage('users', count, generate)
 
     def tags_gen(self, count):
-        print("Tags generating...")
-        word = [None] * 2
-        tags = [None] * count
-        used_words = []
-        for i in range(count):
-            print(i)
-            for j in range(2):
-                word[j] = random.choice(WORD_LIST)
-            while word in used_words:
-                for j in range(2):
-                    word[j] = random.choice(WORD_LIST)
-            used_words.append(word.copy())
-
-            tags[i] = Tag(name="".join(word))
-
-        Tag.objects.bulk_create(tags)
-        print("Success.")
+        def generate():
+            pairs = [''.join(pair) for pair in product(WORD_LIST, repeat=2)]
+            self.random.shuffle(pairs)
+            names = [pairs[i % len(pairs)] + (str(i // len(pairs)) if i >= len(pairs) else '') for i in range(count)]
+            with transaction.atomic():
+                self.batches(Tag, [Tag(name=name) for name in names])
+            self.tag_ids = list(Tag.objects.order_by('id').values_list('id', flat=True))
+
+        self.stage('tags', count, generate)
 
     def questions_gen(self, count):
-        print("Questions generating...")
-        prof_min_id = Profile.objects.order_by('id')[0].id
-        prof_max_id = Profile.objects.order_by('-id')[0].id
-        tag_min_id = Tag.objects.order_by('id')[0].id
-        tag_max_id = Tag.objects.order_by('-id')[0].id
-
-        questions = [None] * count
-        for i in range(count):
-            print(i)
-            title = self.faker.paragraph(1)[:-1] + '?'
-            text = self.faker.paragraph(random.randint(5, 20))
-            profile_id = random.randint(prof_min_id, prof_max_id)
-
-            questions[i] = Question(text=text, title=title, profile_id=profile_id)
-        questions = Question.objects.bulk_create(questions)
-        print("Success.")
-
-        print("Adding tags to questions...")
-        tags = [None] * 10
-        for i in range(count):
-            print(i)
-            n_tags = random.randint(1, 5)
-            for j in range(n_tags):
-                tags[j] = Tag.objects.get(id=random.randint(tag_min_id, tag_max_id))
-            questions[i].tags.add(*tags[:n_tags])
-            questions[i].save()
-        print("Success.")
+        def generate():
+            self.question_ids = []
+            n_links = 0
+            for chunk in self.texts('questions', count):
+                with transaction.atomic():
+                    questions = Question.objects.bulk_create(
+                        [Question(title=title, text=text, profile_id=self.random.choice(self.profile_ids))
+                         for title, text in chunk])
+                    n_links += len(QuestionTag.objects.link(
+                        (question, tag_id) for question in questions
+                        for tag_id in self.random.sample(self.tag_ids, min(self.random.randint(1, 5), len(self.tag_ids)))))
+                self.question_ids += [question.id for question in questions]
+            return count + n_links
+
+        self.stage('questions', count, generate)
 
     def answers_gen(self, count):
-        print("Answers generating...")
-        prof_min_id = Profile.objects.order_by('id')[0].id
-        prof_max_id = Profile.objects.order_by('-id')[0].id
-        que_min_id = Question.objects.order_by('id')[0].id
-        que_max_id = Question.objects.order_by('-id')[0].id
-
-        answers = [None] * count
-        for i in range(count):
-            print(i)
-            text = self.faker.paragraph(random.randint(5, 20))
-            profile_id = random.randint(prof_min_id, prof_max_id)
-            question_id = random.randint(que_min_id, que_max_id)
-
-            answers[i] = Answer(text=text, profile_id=profile_id, question_id=question_id)
-        Answer.objects.bulk_create(answers)
-        print("Success.")
+        def generate():
+            self.answer_ids = []
+            for chunk in self.texts('answers', count):
+                with transaction.atomic():
+                    answers = Answer.objects.bulk_create(
+                        [Answer(text=text, profile_id=self.random.choice(self.profile_ids),
+                                question_id=self.random.choice(self.question_ids))
+                         for text in chunk])
+                self.answer_ids += [answer.id for answer in answers]
+
+        self.stage('answers', count, generate)
 
     def reputations_gen(self, count):
-        prof_min_id = Profile.objects.order_by('id')[0].id
-        prof_max_id = Profile.objects.order_by('-id')[0].id
-        que_min_id = Question.objects.order_by('id')[0].id
-        que_max_id = Question.objects.order_by('-id')[0].id
-
-        n_q_likes = count // 4
-        q_likes = [None] * n_q_likes
-        used_pairs = []
-        print('Question likes generating...')
-        for j in range(n_q_likes):
-            print(j)
-            profile_id = random.randint(prof_min_id, prof_max_id)
-            question_id = random.randint(que_min_id, que_max_id)
-            while (profile_id, question_id) in used_pairs:
-                profile_id = random.randint(prof_min_id, prof_max_id)
-                question_id = random.randint(que_min_id, que_max_id)
-            used_pairs.append((profile_id, question_id))
-
-            question = Question.objects.get(id=question_id)
-            question.rating += 1
-            question.save()
-
-            q_likes[j] = Reputation(reputation=1, profile_id=profile_id, content_object=question)
-        Reputation.objects.bulk_create(q_likes)
-        print("Success.")
-
-        n_q_dislikes = count // 4
-        q_dislikes = [None] * n_q_dislikes
-        print('Question dislikes generating...')
-        for j in range(n_q_dislikes):
-            print(j)
-            profile_id = random.randint(prof_min_id, prof_max_id)
-            question_id = random.randint(que_min_id, que_max_id)
-            while (profile_id, question_id) in used_pairs:
-                profile_id = random.randint(prof_min_id, prof_max_id)
-                question_id = random.randint(que_min_id, que_max_id)
-            used_pairs.append((profile_id, question_id))
-
-            question = Question.objects.get(id=question_id)
-            question.rating -= 1
-            question.save()
-
-            q_dislikes[j] = Reputation(reputation=-1, profile_id=profile_id, content_object=question)
-        Reputation.objects.bulk_create(q_dislikes)
-        print("Success.")
-
-        ans_min_id = Answer.objects.order_by('id')[0].id
-        ans_max_id = Answer.objects.order_by('-id')[0].id
-
-        n_a_likes = count // 4
-        a_likes = [None] * n_a_likes
-        used_pairs = []
-        print("Answer likes generating...")
-        for j in range(n_a_likes):
-            print(j)
-            profile_id = random.randint(prof_min_id, prof_max_id)
-            answer_id = random.randint(ans_min_id, ans_max_id)
-            while (profile_id, answer_id) in used_pairs:
-                profile_id = random.randint(prof_min_id, prof_max_id)
-                answer_id = random.randint(ans_min_id, ans_max_id)
-            used_pairs.append((profile_id, answer_id))
-
-            answer = Answer.objects.get(id=answer_id)
-            answer.rating += 1
-            answer.save()
-
-            a_likes[j] = Reputation(reputation=1, profile_id=profile_id, content_object=answer)
-        Reputation.objects.bulk_create(a_likes)
-        print("Success.")
-
-        n_a_dislikes = count - n_a_likes * 3
-        a_dislikes = [None] * n_a_dislikes
-        print("Answer dislikes generating...")
-        for j in range(n_a_dislikes):
-            print(j)
-            profile_id = random.randint(prof_min_id, prof_max_id)
-            answer_id = random.randint(ans_min_id, ans_max_id)
-            while (profile_id, answer_id) in used_pairs:
-                profile_id = random.randint(prof_min_id, prof_max_id)
-                answer_id = random.randint(ans_min_id, ans_max_id)
-            used_pairs.append((profile_id, answer_id))
-
-            answer = Answer.objects.get(id=answer_id)
-            answer.rating -= 1
-            answer.save()
-
-            a_dislikes[j] = Reputation(reputation=-1, profile_id=profile_id, content_object=answer)
-        Reputation.objects.bulk_create(a_dislikes)
-        print("Success.")
\ No newline at end of file
+        def votes(model, object_ids, n_likes, n_dislikes):
+            content_type_id = ContentType.objects.get_for_model(model).id
+            n_votes = min(n_likes + n_dislikes, len(self.profile_ids) * len(object_ids))
+            used_pairs = {}
+            while len(used_pairs) < n_votes:
+                used_pairs[self.random.choice(self.profile_ids), self.random.choice(object_ids)] = None
+            reputations = [Reputation(reputation=Reputation.LIKE if i < n_likes else Reputation.DISLIKE,
+                                      profile_id=profile_id, content_type_id=content_type_id, object_id=object_id)
+                           for i, (profile_id, object_id) in enumerate(used_pairs)]
+            with transaction.atomic():
+                self.batches(Reputation, reputations, ignore_conflicts=True)
+            return n_votes
+
+        def generate():
+            n_q_votes = count // 4
+            n_a_likes = count // 4
+            return (votes(Question, self.question_ids, n_q_votes, n_q_votes)
+                    + votes(Answer, self.answer_ids, n_a_likes, count - n_a_likes * 3))
+
+        self.stage('votes', count, generate)
+
+    def counters_gen(self):
+        # Ratings, hot scores and authors' counters in one aggregate pass each.
+        call_command('rebuild_votes', stdout=self.stdout)
+        call_command('decay_hot', stdout=self.stdout)
+        call_command('reconcile_profiles', stdout=self.stdout)
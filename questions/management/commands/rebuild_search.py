@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from questions import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild and optimize the full-text search index of questions and answers'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Full-text search requires the SQLite backend')
+        search.rebuild()
+        self.stdout.write('Search index rebuilt')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, Sum, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from questions.models import Question, Answer, Reputation
+
+
+class Command(BaseCommand):
+    help = 'Rebuild likes_count, dislikes_count and rating of questions and answers from Reputation'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for model in (Question, Answer):
+                updated = self.rebuild(model)
+                self.stdout.write(f'{model.__name__}: {updated} rows rebuilt')
+
+    def rebuild(self, model):
+        votes = Reputation.objects.filter(
+            content_type=ContentType.objects.get_for_model(model), object_id=OuterRef('pk')
+        ).order_by().values('object_id')
+
+        def total(queryset, aggregate):
+            return Coalesce(Subquery(queryset.annotate(total=aggregate).values('total')), 0)
+
+        return model.objects.update(
+            likes_count=total(votes.filter(reputation=Reputation.LIKE), Count('id')),
+            dislikes_count=total(votes.filter(reputation=Reputation.DISLIKE), Count('id')),
+            rating=total(votes, Sum('reputation')),
+        )
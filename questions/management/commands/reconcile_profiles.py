@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from questions.models import Profile, Question, Answer
+
+
+class Command(BaseCommand):
+    help = 'Repair answers_count and questions_count of every profile'
+
+    def handle(self, *args, **options):
+        def total(model):
+            authored = model.objects.filter(profile_id=OuterRef('pk')).order_by().values('profile_id')
+            return Coalesce(Subquery(authored.annotate(total=Count('id')).values('total')), 0)
+
+        with transaction.atomic():
+            drifted = Profile.objects.exclude(answers_count=total(Answer), questions_count=total(Question))
+            repaired = drifted.update(answers_count=total(Answer), questions_count=total(Question))
+        self.stdout.write(f'{repaired} profiles repaired')
@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, OperationalError
+from django.db.models import Count, Q, Sum
+from questions.models import Question, Profile, Answer, Reputation
+
+
+class Command(BaseCommand):
+    help = 'Vote concurrently on one question and answer, then check that no vote was lost'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=8, help='Threads voting at the same time')
+        parser.add_argument('--rounds', type=int, default=10, help='Votes cast by every voter')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, **options):
+        profiles = list(Profile.objects.order_by('id')[:options['voters']])
+        question = Question.objects.filter(answer__isnull=False).order_by('-id').first()
+        if question is None or not profiles:
+            raise CommandError('No profiles or answered questions, run fill_db first')
+        targets = [(Question, question.id), (Answer, question.answer.order_by('id').values_list('id', flat=True)[0])]
+
+        def cast(profile):
+            rng = random.Random(f'{options["seed"]}:{profile.id}')
+            errors = 0
+            try:
+                for _ in range(options['rounds']):
+                    model, object_id = rng.choice(targets)
+                    try:
+                        Reputation.objects.vote(profile, model, object_id, rng.choice([Reputation.LIKE, Reputation.DISLIKE, 0]))
+                    except OperationalError as error:
+                        # A vote that timed out waiting for the lock is rolled back as a whole.
+                        errors += 1
+                        self.stderr.write(f'{profile}: {error}')
+            finally:
+                connection.close()
+            return errors
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['workers']) as executor:
+            errors = sum(executor.map(cast, profiles))
+        elapsed = time.perf_counter() - started
+        n_votes = len(profiles) * options['rounds']
+        self.stdout.write(f'{n_votes} votes in {elapsed:.2f}s ({n_votes / elapsed:.0f} votes/s), {errors} rejected')
+
+        drifted = 0
+        for model, object_id in targets:
+            stored = model.objects.filter(id=object_id).values('likes_count', 'dislikes_count', 'rating').get()
+            actual = Reputation.objects.filter(content_type__model=model._meta.model_name, object_id=object_id).aggregate(
+                likes_count=Count('id', filter=Q(reputation=Reputation.LIKE)),
+                dislikes_count=Count('id', filter=Q(reputation=Reputation.DISLIKE)),
+                rating=Sum('reputation', default=0))
+            self.stdout.write(f'{model.__name__} {object_id}: stored {stored}, actual {actual}')
+            drifted += stored != actual
+        if drifted:
+            raise CommandError('Votes were lost under concurrency')
+        self.stdout.write(self.style.SUCCESS('No lost updates'))
@@ -0,0 +1,39 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into the replica files (a local stand-in for replication)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep copying every INTERVAL seconds')
+
+    def handle(self, **options):
+        databases = [settings.DATABASES[alias] for alias in ['default', *settings.REPLICA_DATABASES]]
+        if any(database['ENGINE'] != 'django.db.backends.sqlite3' for database in databases):
+            raise CommandError('sync_replicas only copies SQLite files')
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('No replicas configured, set RIDDLE_SQLITE_REPLICAS')
+        while True:
+            started = time.perf_counter()
+            self.sync(databases[0]['NAME'], [database['NAME'] for database in databases[1:]])
+            self.stdout.write(f'{len(databases) - 1} replicas synced in {time.perf_counter() - started:.2f}s')
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
+
+    def sync(self, primary, replicas):
+        # The backup API copies a consistent snapshot even while the primary is being written.
+        source = sqlite3.connect(primary)
+        try:
+            for name in replicas:
+                target = sqlite3.connect(name)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
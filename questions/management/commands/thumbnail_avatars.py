@@ -0,0 +1,40 @@
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from questions.avatars import thumbnail_avatars, variant_sizes
+from questions.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Make the resized copies of the avatars that have none yet (run at deploy: the media ' \
+           'directory is not part of the repository)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Check every avatar, e.g. to add the variants of new AVATAR_SIZES')
+
+    def handle(self, **options):
+        profiles = Profile.objects.exclude(avatar='').exclude(avatar__isnull=True)
+        if not options['all']:
+            # On a fresh media storage the recorded thumbnails are gone as well.
+            size = variant_sizes()[0]
+            lost = [prefix for prefix in profiles.exclude(avatar_thumbnail='').order_by()
+                    .values_list('avatar_thumbnail', flat=True).distinct()
+                    if not default_storage.exists(f'{prefix}-{size}.webp')]
+            profiles = profiles.filter(Q(avatar_thumbnail='') | Q(avatar_thumbnail__in=lost))
+        names = list(profiles.order_by('avatar').values_list('avatar', flat=True).distinct())
+
+        started = time.perf_counter()
+        updated = failed = 0
+        for name in names:
+            try:
+                updated += len(thumbnail_avatars(name))
+            except OSError as error:
+                # Missing files and images Pillow can't read (e.g. SVG) keep the original.
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+        self.stdout.write(f'{len(names)} avatars, {updated} profiles updated, {failed} failed '
+                          f'in {time.perf_counter() - started:.1f}s')
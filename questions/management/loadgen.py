@@ -0,0 +1,152 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from wsgiref.util import setup_testing_defaults
+import asyncio
+import http.client
+import io
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+
+from questions import metrics
+
+# Drives Riddle with many concurrent clients for bench and bench_async: in-process through
+# the WSGI or ASGI handler, or over HTTP against a running server.
+
+Request = namedtuple('Request', 'kind method path body headers')
+Result = namedtuple('Result', 'request status headers latency queries')
+
+HOST = 'localhost'
+
+
+def login_cookie(user):
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+
+def wsgi_sender():
+    application = get_wsgi_application()
+
+    def send(request):
+        environ = {
+            'REQUEST_METHOD': request.method,
+            'PATH_INFO': request.path.partition('?')[0],
+            'QUERY_STRING': request.path.partition('?')[2],
+            'HTTP_HOST': HOST,
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(request.body)),
+            'wsgi.input': io.BytesIO(request.body),
+            **{'HTTP_' + name.upper().replace('-', '_'): value for name, value in request.headers.items()},
+        }
+        setup_testing_defaults(environ)
+        started = []
+
+        def start_response(status, headers):
+            started.append((int(status.split()[0]), dict(headers)))
+
+        recorder = metrics.Recorder()
+        token = metrics.current.set(recorder)
+        try:
+            b''.join(application(environ, start_response))
+        finally:
+            metrics.current.reset(token)
+        return (*started[0], len(recorder.queries))
+    return send
+
+
+def asgi_sender():
+    application = get_asgi_application()
+
+    async def send(request):
+        path, _, query = request.path.partition('?')
+        headers = [(b'host', HOST.encode()), (b'content-type', b'application/x-www-form-urlencoded')]
+        headers += [(name.lower().encode(), value.encode()) for name, value in request.headers.items()]
+        scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': request.method,
+                 'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+                 'root_path': '', 'headers': headers, 'client': ('127.0.0.1', 0), 'server': (HOST, 80)}
+        done = asyncio.Event()
+        messages = [{'type': 'http.request', 'body': request.body, 'more_body': False}]
+        response = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send_message(message):
+            if message['type'] == 'http.response.start':
+                response.append((message['status'], {name.decode().title(): value.decode()
+                                                      for name, value in message['headers']}))
+            elif not message.get('more_body'):
+                done.set()
+
+        recorder = metrics.Recorder()
+        token = metrics.current.set(recorder)
+        try:
+            await application(scope, receive, send_message)
+        finally:
+            metrics.current.reset(token)
+        return (*response[0], len(recorder.queries))
+    return send
+
+
+def http_sender(base_url):
+    url = urlsplit(base_url)
+    local = threading.local()
+
+    def send(request):
+        # One keep-alive connection per client thread.
+        if not hasattr(local, 'connection'):
+            local.connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        headers = {'Content-Type': 'application/x-www-form-urlencoded', **request.headers}
+        local.connection.request(request.method, url.path.rstrip('/') + request.path, request.body, headers)
+        response = local.connection.getresponse()
+        response.read()
+        # Out of process the queries are only known from the header, sent when DEBUG is on.
+        headers = dict(response.getheaders())
+        queries = int(headers['X-Query-Count']) if 'X-Query-Count' in headers else None
+        return response.status, headers, queries
+    return send
+
+
+def timed(send, request):
+    started = time.perf_counter()
+    status, headers, queries = send(request)
+    return Result(request, status, headers, time.perf_counter() - started, queries)
+
+
+def run_threads(send, requests, concurrency):
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(lambda request: timed(send, request), requests))
+
+
+async def run_tasks(send, requests, concurrency):
+    pending = iter(requests)
+    results = []
+
+    async def client():
+        for request in pending:
+            started = time.perf_counter()
+            status, headers, queries = await send(request)
+            results.append(Result(request, status, headers, time.perf_counter() - started, queries))
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return results
+
+
+def run(interface, requests, concurrency, url=None):
+    if interface == 'asgi':
+        return asyncio.run(run_tasks(asgi_sender(), requests, concurrency))
+    send = http_sender(url) if interface == 'http' else wsgi_sender()
+    return run_threads(send, requests, concurrency)
@@ -0,0 +1,17 @@
+import random
+
+from faker import Faker
+
+
+def generate_chunk(task):
+    # Runs in fill_db worker processes, so it must not import Django models.
+    # Every chunk has its own seed: the output does not depend on the number of workers.
+    kind, seed, count = task
+    faker = Faker()
+    faker.seed_instance(seed)
+    rnd = random.Random(seed)
+    if kind == 'users':
+        return [(faker.user_name(), faker.first_name(), faker.last_name(), faker.email()) for _ in range(count)]
+    if kind == 'questions':
+        return [(faker.paragraph(1)[:-1] + '?', faker.paragraph(rnd.randint(5, 20))) for _ in range(count)]
+    return [faker.paragraph(rnd.randint(5, 20)) for _ in range(count)]
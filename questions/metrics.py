@@ -0,0 +1,156 @@
+from collections import defaultdict, deque
+from contextvars import ContextVar
+import asyncio
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger('questions.metrics')
+
+FIELDS = ('queries', 'db_ms', 'template_ms', 'total_ms')
+
+# The recorder of the request being served. Context variables follow the request into
+# sync_to_async() threads, so queries of the async views are counted too.
+current = ContextVar('request_metrics', default=None)
+
+
+class Recorder:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.template_time = 0
+        self.rendering = False
+
+    def sample(self):
+        return {
+            'queries': len(self.queries),
+            'db_ms': sum(duration for sql, duration in self.queries) * 1000,
+            'template_ms': self.template_time * 1000,
+            'total_ms': (time.perf_counter() - self.started) * 1000,
+        }
+
+
+class RequestMetrics:
+    # The last `window` samples of every URL name, summarized as percentiles on demand.
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, label, sample):
+        with self._lock:
+            self._samples[label].append(sample)
+
+    def summary(self):
+        with self._lock:
+            samples = {label: list(values) for label, values in self._samples.items()}
+        return {label: {'count': len(values), **{field: percentiles([value[field] for value in values])
+                                                 for field in FIELDS}}
+                for label, values in sorted(samples.items())}
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+
+def percentiles(values):
+    values = sorted(values)
+    return {f'p{p}': round(values[min(len(values) - 1, len(values) * p // 100)], 2) for p in (50, 95, 99)}
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = current.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.queries.append((sql, time.perf_counter() - started))
+
+
+def instrument_connection(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        recorder = current.get()
+        if recorder is None or recorder.rendering:
+            return self.template.render(context, request)
+        recorder.rendering = True
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            recorder.template_time += time.perf_counter() - started
+            recorder.rendering = False
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    # The Django template engine, timing the top-level render of every template.
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def finish(request, response, recorder):
+    match = getattr(request, 'resolver_match', None)
+    label = match.view_name if match is not None else 'unresolved'
+    sample = recorder.sample()
+    request_metrics.record(label, sample)
+
+    budget = settings.QUERY_BUDGETS.get(label, settings.QUERY_BUDGET_DEFAULT)
+    if sample['queries'] > budget:
+        slowest = sorted(recorder.queries, key=lambda query: query[1], reverse=True)[:settings.QUERY_BUDGET_LOG_SLOWEST]
+        logger.warning('%s ran %d queries (budget %d), slowest:\n%s', label, sample['queries'], budget,
+                       '\n'.join(f'{duration * 1000:.2f} ms: {sql}' for sql, duration in slowest))
+
+    if settings.DEBUG:
+        response['X-Query-Count'] = sample['queries']
+        response['Server-Timing'] = ', '.join(f'{name};dur={sample[field]:.2f}' for name, field in
+                                              (('db', 'db_ms'), ('template', 'template_ms'), ('total', 'total_ms')))
+    return response
+
+
+@sync_and_async_middleware
+def request_metrics_middleware(get_response):
+    # A recorder already set around the handler (the in-process load generator) is reused,
+    # so the caller sees the request's queries whether or not DEBUG sends X-Query-Count.
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            recorder = current.get() or Recorder()
+            token = current.set(recorder)
+            try:
+                response = await get_response(request)
+            finally:
+                current.reset(token)
+            return finish(request, response, recorder)
+    else:
+        def middleware(request):
+            recorder = current.get() or Recorder()
+            token = current.set(recorder)
+            try:
+                response = get_response(request)
+            finally:
+                current.reset(token)
+            return finish(request, response, recorder)
+    return middleware
+
+
+request_metrics = RequestMetrics(window=getattr(settings, 'REQUEST_METRICS_WINDOW', 1000))
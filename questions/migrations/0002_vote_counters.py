@@ -0,0 +1,33 @@
+# Generated by Django 4.1.2 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="answer",
+            name="dislikes_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="Dislikes count"),
+        ),
+        migrations.AddField(
+            model_name="answer",
+            name="likes_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="Likes count"),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="dislikes_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="Dislikes count"),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="likes_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="Likes count"),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.1.2 on 2026-10-18 16:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questions", "0002_vote_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="hot_score",
+            field=models.FloatField(default=0, verbose_name="Hotness score"),
+        ),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(fields=["-hot_score", "-id"], name="question_hot_idx"),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.1.2 on 2026-10-18 16:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questions", "0003_question_hot_score"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="answer",
+            index=models.Index(
+                fields=["question", "pub_date", "id"], name="answer_question_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(fields=["-pub_date", "-id"], name="question_new_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="reputation",
+            index=models.Index(
+                fields=["content_type", "object_id", "reputation"],
+                name="reputation_object_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+from questions.search import FTS_TABLES, table_statements, trigger_statements
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in table_statements():
+        schema_editor.execute(statement)
+    for name, body in trigger_statements():
+        schema_editor.execute(f"CREATE TRIGGER {name} {body}")
+    for fts in FTS_TABLES:
+        schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for fts in FTS_TABLES:
+        for trigger in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts}_{trigger}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {fts}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questions", "0004_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
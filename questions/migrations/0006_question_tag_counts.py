@@ -0,0 +1,109 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def fill_tag_columns(apps, schema_editor):
+    Question = apps.get_model("questions", "Question")
+    QuestionTag = apps.get_model("questions", "QuestionTag")
+    Tag = apps.get_model("questions", "Tag")
+    QuestionTag.objects.update(
+        pub_date=Subquery(
+            Question.objects.filter(id=OuterRef("question_id")).values("pub_date")[:1]
+        )
+    )
+    Tag.objects.update(
+        question_count=Coalesce(
+            Subquery(
+                QuestionTag.objects.filter(tag_id=OuterRef("pk"))
+                .order_by()
+                .values("tag_id")
+                .annotate(total=Count("id"))
+                .values("total")
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questions", "0005_search_index"),
+    ]
+
+    operations = [
+        # The auto-created through table is kept, only its model becomes explicit.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="QuestionTag",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        (
+                            "question",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="tagged",
+                                to="questions.question",
+                            ),
+                        ),
+                        (
+                            "tag",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="tagged",
+                                to="questions.tag",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "db_table": "questions_question_tags",
+                        "unique_together": {("question", "tag")},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name="question",
+                    name="tags",
+                    field=models.ManyToManyField(
+                        blank=True,
+                        related_name="question",
+                        through="questions.QuestionTag",
+                        to="questions.tag",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="questiontag",
+            name="pub_date",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                verbose_name="Question publish date",
+            ),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="question_count",
+            field=models.PositiveIntegerField(
+                db_index=True, default=0, verbose_name="Questions count"
+            ),
+        ),
+        migrations.RunPython(fill_tag_columns, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="questiontag",
+            index=models.Index(
+                fields=["tag", "-pub_date", "-question"], name="question_tag_feed_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.2 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questions", "0006_question_tag_counts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="answers_count",
+            field=models.PositiveIntegerField(
+                db_index=True, default=0, verbose_name="Answers count"
+            ),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="questions_count",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Questions count"
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.2 on 2026-10-18 17:07
+
+from django.db import migrations, models
+
+
+def clear_broken_default(apps, schema_editor):
+    # The old default was a template fragment ("static/images/default.svg' %}"), not an image.
+    Profile = apps.get_model("questions", "Profile")
+    Profile.objects.filter(avatar__endswith="default.svg' %}").update(avatar="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questions", "0007_profile_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="avatar_thumbnail",
+            field=models.CharField(
+                blank=True, default="", max_length=64, verbose_name="Avatar thumbnails"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="profile",
+            name="avatar",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                upload_to="avatars/",
+                verbose_name="Profile avatar",
+            ),
+        ),
+        migrations.RunPython(clear_broken_default, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+import math
+
+from django.db import migrations
+from django.db.models import Count
+
+# The formula of questions.models.hot_rank when the scores stopped decaying with time.
+HOT_ANSWER_WEIGHT = 2
+HOT_DECAY_SECONDS = 45000
+HOT_EPOCH = 1640995200
+
+
+def rank(rating, answers, pub_date):
+    points = rating + HOT_ANSWER_WEIGHT * answers
+    order = math.log10(abs(points) + 1)
+    return math.copysign(order, points) + (pub_date.timestamp() - HOT_EPOCH) / HOT_DECAY_SECONDS
+
+
+def rescore(apps, schema_editor):
+    Question = apps.get_model("questions", "Question")
+    rows = Question.objects.order_by().annotate(n_answers=Count("answer")).values_list(
+        "id", "rating", "n_answers", "pub_date").iterator(chunk_size=2000)
+    batch = []
+    for id, rating, n_answers, pub_date in rows:
+        batch.append(Question(id=id, hot_score=rank(rating, n_answers, pub_date)))
+        if len(batch) == 2000:
+            Question.objects.bulk_update(batch, ["hot_score"])
+            batch = []
+    Question.objects.bulk_update(batch, ["hot_score"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questions", "0008_profile_avatar_thumbnails"),
+    ]
+
+    operations = [
+        migrations.RunPython(rescore, migrations.RunPython.noop),
+    ]
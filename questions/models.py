@@ -1,20 +1,58 @@
-from django.db import models
+from urllib.parse import quote
+
+import numpy as np
+
+from django.db import models, transaction
 from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericRelation, GenericForeignKey
-from django.db.models import Count, Sum
+from django.templatetags.static import static
+from django.db.models import Count, Sum, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from questions.caching import bump
+
+
+HOT_ANSWER_WEIGHT = 2
+# A question needs ten times the points to rank with one published this much later.
+HOT_DECAY_SECONDS = 45000
+HOT_EPOCH = 1640995200  # 2022-01-01, keeps the time term small
+
+TAG_ID_CACHE_TIMEOUT = 60 * 60
+
+
+def hot_score(rating, answers, pub_date):
+    return float(hot_rank(rating + HOT_ANSWER_WEIGHT * answers, pub_date.timestamp()))
+
+
+def hot_rank(points, published):
+    # Numbers or numpy arrays: decay_hot recomputes a whole chunk at once. The score only
+    # depends on the points and the publish time, never on when it is computed, so the
+    # rows updated after a vote compare with all the others without a global re-decay.
+    # Negative points count down by the same log scale, they never drift back to 0.
+    order = np.log10(np.abs(points) + 1)
+    return np.sign(points) * order + (published - HOT_EPOCH) / HOT_DECAY_SECONDS
 
-static_url = settings.STATIC_URL
 
 class ProfileManager(models.Manager):
     def top_users(self, count=5):
-        return self.annotate(n_answers=Count('answer')).order_by('-n_answers')[:count]
+        return self.order_by('-answers_count')[:count]
+
+    def shift_count(self, profile_id, field, delta):
+        if profile_id is None or not delta:
+            return 0
+        return self.filter(id=profile_id).update(**{field: F(field) + delta})
 
 
 class Profile(models.Model):
-    avatar = models.ImageField(null=True, blank=True, verbose_name='Profile avatar',
-                               default=static_url+"images/default.svg' %}")
+    avatar = models.ImageField(null=True, blank=True, upload_to='avatars/', verbose_name='Profile avatar')
+    # Prefix of the resized copies of the avatar, see questions/avatars.py.
+    avatar_thumbnail = models.CharField(max_length=64, blank=True, default='', verbose_name='Avatar thumbnails')
+    answers_count = models.PositiveIntegerField(default=0, db_index=True, verbose_name='Answers count')
+    questions_count = models.PositiveIntegerField(default=0, verbose_name='Questions count')
 
     user = models.OneToOneField(to=User, related_name='profile', on_delete=models.CASCADE, null=False)
 
@@ -23,20 +61,91 @@ class Profile(models.Model):
     def __str__(self):
         return self.user.username
 
+    @property
+    def avatar_url(self):
+        if not self.avatar:
+            return static('images/default.svg')
+        # fill_db stores the url of a static image as the avatar.
+        if self.avatar.name.startswith('/'):
+            return self.avatar.name
+        return self.avatar.url
+
+    @property
+    def thumbnail_url(self):
+        return settings.MEDIA_URL + self.avatar_thumbnail if self.avatar_thumbnail else ''
+
+
+def tag_id_cache_key(name):
+    return f'tag-id:{quote(name)}'
+
 
 class TagManager(models.Manager):
     def top_tags(self, count=5):
-        return self.annotate(n_questions=Count('question')).order_by('-n_questions')[:count]
+        return self.order_by('-question_count')[:count]
+
+    def id_for_name(self, name):
+        key = tag_id_cache_key(name)
+        tag_id = cache.get(key)
+        if tag_id is None:
+            tag_id = self.filter(name=name).values_list('id', flat=True).first()
+            if tag_id is not None:
+                cache.set(key, tag_id, TAG_ID_CACHE_TIMEOUT)
+        return tag_id
+
+    async def aid_for_name(self, name):
+        key = tag_id_cache_key(name)
+        tag_id = await cache.aget(key)
+        if tag_id is None:
+            tag_id = await self.filter(name=name).values_list('id', flat=True).afirst()
+            if tag_id is not None:
+                await cache.aset(key, tag_id, TAG_ID_CACHE_TIMEOUT)
+        return tag_id
+
+    def shift_question_counts(self, tag_ids, delta):
+        return self.filter(id__in=tag_ids).update(question_count=F('question_count') + delta)
+
+    def recount_questions(self, tag_ids):
+        links = (QuestionTag.objects.filter(tag_id=OuterRef('pk')).order_by().values('tag_id')
+                 .annotate(n=Count('id')).values('n'))
+        return self.filter(id__in=tag_ids).update(question_count=Coalesce(Subquery(links), 0))
+
+    def resolve(self, names):
+        names = set(names)
+        tag_ids = dict(self.filter(name__in=names).values_list('name', 'id'))
+        missing = names - tag_ids.keys()
+        if missing:
+            # Another request may create the same tags meanwhile: skip them and read the ids back.
+            self.bulk_create([self.model(name=name) for name in missing], ignore_conflicts=True)
+            tag_ids.update(self.filter(name__in=missing).values_list('name', 'id'))
+        return tag_ids
+
+    @transaction.atomic
+    def attach(self, tagged):
+        tagged = [(question, names) for question, names in tagged]
+        tag_ids = self.resolve(name for question, names in tagged for name in names)
+        return QuestionTag.objects.link((question, tag_ids[name]) for question, names in tagged for name in names)
 
 
 class Tag(models.Model):
     name = models.CharField(max_length=32, verbose_name='Tag name', unique=True)
+    question_count = models.PositiveIntegerField(default=0, db_index=True, verbose_name='Questions count')
 
     objects = TagManager()
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # The name the id is cached under until a rename (questions/signals.py).
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_name = dict(zip(field_names, values)).get('name')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_name = self.name
+
 
 class ReputationManager(models.Manager):
     use_for_related_fields = True
@@ -47,6 +156,26 @@ class ReputationManager(models.Manager):
     def dislikes(self):
         return self.get_queryset().filter(reputation__lt=0).aggregate(Sum('reputation')).get('reputation__sum') or 0
 
+    @transaction.atomic
+    def vote(self, profile, model, object_id, value):
+        # The no-op update takes the write lock on the voted row first, so concurrent votes
+        # for the same object queue up instead of racing between the read and the write.
+        if not model.objects.filter(id=object_id).update(rating=F('rating')):
+            raise model.DoesNotExist
+        content_type = ContentType.objects.get_for_model(model)
+        current = self.filter(profile=profile, content_type=content_type, object_id=object_id).first()
+        if current is not None and current.reputation == value:
+            value = 0
+        if current is None and value:
+            self.create(profile=profile, content_type=content_type, object_id=object_id, reputation=value)
+        elif current is not None and not value:
+            current.delete()
+        elif current is not None:
+            current.reputation = value
+            current.save(update_fields=['reputation'])
+        counts = model.objects.filter(id=object_id).values('likes_count', 'dislikes_count', 'rating').get()
+        return {'vote': value, **counts}
+
 class Reputation(models.Model):
     LIKE = 1
     DISLIKE = -1
@@ -68,47 +197,157 @@ class Reputation(models.Model):
 
     class Meta:
         unique_together = ('profile', 'content_type', 'object_id')
-
-
-class QuestionManager(models.Manager):
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', 'reputation'], name='reputation_object_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_reputation = dict(zip(field_names, values)).get('reputation')
+        return instance
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            if self.pk is not None and not hasattr(self, '_loaded_reputation'):
+                self._loaded_reputation = Reputation.objects.filter(pk=self.pk).values_list(
+                    'reputation', flat=True).first()
+            super().save(*args, **kwargs)
+        self._loaded_reputation = self.reputation
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+
+
+class ProfileTracking:
+    # Remembers the author loaded from the database, so reassigning it can move the counters.
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_profile_id = dict(zip(field_names, values)).get('profile_id')
+        return instance
+
+
+class VotesManager(models.Manager):
+    def shift_votes(self, object_id, old=0, new=0):
+        return self.filter(id=object_id).update(
+            likes_count=F('likes_count') + int(new == Reputation.LIKE) - int(old == Reputation.LIKE),
+            dislikes_count=F('dislikes_count') + int(new == Reputation.DISLIKE) - int(old == Reputation.DISLIKE),
+            rating=F('rating') + new - old,
+        )
+
+
+class QuestionManager(VotesManager):
     def new(self):
-        return self.order_by('-pub_date')
+        return self.order_by('-pub_date', '-id')
 
     def hot(self):
-        return self.order_by('-rating')
+        return self.order_by('-hot_score', '-id')
 
     def by_tag(self, tag):
-        return self.filter(tags__name=tag)
+        return self.by_tag_id(Tag.objects.id_for_name(tag))
+
+    async def aby_tag(self, tag):
+        return self.by_tag_id(await Tag.objects.aid_for_name(tag))
+
+    def by_tag_id(self, tag_id):
+        if tag_id is None:
+            return self.none().order_by('-pub_date', '-id')
+        return self.filter(tagged__tag_id=tag_id).annotate(
+            tagged_at=F('tagged__pub_date'), tagged_id=F('tagged__question_id')).order_by('-tagged_at', '-tagged_id')
 
     def by_id(self, id):
         return self.filter(id=id)
 
+    def hot_score_rows(self, queryset=None):
+        return (queryset if queryset is not None else self.all()).order_by().annotate(
+            n_answers=Count('answer')).values_list('id', 'rating', 'n_answers', 'pub_date')
+
+    def update_hot_scores(self, queryset=None):
+        scores = {id: hot_score(rating, n_answers, pub_date)
+                  for id, rating, n_answers, pub_date in self.hot_score_rows(queryset)}
+        return self.set_hot_scores(scores.keys(), scores.values())
+
+    def set_hot_scores(self, ids, scores):
+        questions = [self.model(id=id, hot_score=score) for id, score in zip(ids, scores)]
+        self.bulk_update(questions, ['hot_score'])
+        return len(questions)
 
-class Question(models.Model):
+
+class Question(ProfileTracking, models.Model):
     title = models.CharField(max_length=256, verbose_name='Question title', blank=False)
     text = models.TextField(verbose_name='Question text', blank=False)
     pub_date = models.DateTimeField(auto_now_add=True, verbose_name='Question publish date')
     rating = models.IntegerField(default=0)
+    likes_count = models.PositiveIntegerField(default=0, verbose_name='Likes count')
+    dislikes_count = models.PositiveIntegerField(default=0, verbose_name='Dislikes count')
+    hot_score = models.FloatField(default=0, verbose_name='Hotness score')
 
     profile = models.ForeignKey(to=Profile, related_name='question', null=True, on_delete=models.SET_NULL)
-    tags = models.ManyToManyField(to=Tag, related_name='question', blank=True)
+    tags = models.ManyToManyField(to=Tag, related_name='question', blank=True, through='QuestionTag')
     reputations = GenericRelation(to=Reputation, related_query_name='question')
 
     objects = QuestionManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='question_new_idx'),
+            models.Index(fields=['-hot_score', '-id'], name='question_hot_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
 
-class AnswerManager(models.Manager):
+class QuestionTagManager(models.Manager):
+    @transaction.atomic
+    def link(self, pairs):
+        pairs = {(question.id, tag_id): question for question, tag_id in pairs}
+        existing = set(self.filter(question_id__in={question_id for question_id, tag_id in pairs})
+                       .values_list('question_id', 'tag_id'))
+        links = [self.model(question_id=question_id, tag_id=tag_id, pub_date=question.pub_date)
+                 for (question_id, tag_id), question in pairs.items() if (question_id, tag_id) not in existing]
+        self.bulk_create(links, ignore_conflicts=True)
+        # Rows a concurrent request inserted first are skipped by the database, so the
+        # counts are taken again rather than shifted by len(links).
+        Tag.objects.recount_questions({link.tag_id for link in links})
+        if links:
+            bump('feeds', *{f'question:{link.question_id}' for link in links})
+        return links
+
+
+class QuestionTag(models.Model):
+    question = models.ForeignKey(to=Question, related_name='tagged', on_delete=models.CASCADE)
+    tag = models.ForeignKey(to=Tag, related_name='tagged', on_delete=models.CASCADE)
+    pub_date = models.DateTimeField(default=timezone.now, verbose_name='Question publish date')
+
+    objects = QuestionTagManager()
+
+    class Meta:
+        db_table = 'questions_question_tags'
+        unique_together = ('question', 'tag')
+        indexes = [
+            models.Index(fields=['tag', '-pub_date', '-question'], name='question_tag_feed_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.question.pub_date:
+            self.pub_date = self.question.pub_date
+        super().save(*args, **kwargs)
+
+
+class AnswerManager(VotesManager):
     def by_question(self, question_id):
-        return self.filter(question_id=question_id)
+        return self.filter(question_id=question_id).order_by('pub_date', 'id')
 
-class Answer(models.Model):
+class Answer(ProfileTracking, models.Model):
     text = models.TextField(verbose_name='Answer text', blank=False)
     correct = models.BooleanField(default=False, verbose_name='Answer correct')
     pub_date = models.DateTimeField(auto_now_add=True, verbose_name='Answer publish date')
     rating = models.IntegerField(default=0)
+    likes_count = models.PositiveIntegerField(default=0, verbose_name='Likes count')
+    dislikes_count = models.PositiveIntegerField(default=0, verbose_name='Dislikes count')
 
     profile = models.ForeignKey(to=Profile, related_name='answer', null=True, on_delete=models.SET_NULL)
     question = models.ForeignKey(to=Question, related_name='answer', on_delete=models.CASCADE)
@@ -116,5 +355,10 @@ class Answer(models.Model):
 
     objects = AnswerManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['question', 'pub_date', 'id'], name='answer_question_idx'),
+        ]
+
     def __str__(self):
         return self.text
\ No newline at end of file
@@ -0,0 +1,142 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+class CursorPage:
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+class CursorPaginator:
+    # Keyset pagination over a queryset ordered by unique keys, e.g. ('-pub_date', '-id').
+    # Cursors are opaque tokens holding the ordering values of the first or last row
+    # of a page, so every page is an index seek instead of COUNT(*) + OFFSET.
+
+    NEXT = 'n'
+    PREVIOUS = 'p'
+
+    def __init__(self, queryset, per_page=5):
+        ordering = queryset.query.order_by
+        if not ordering:
+            raise ValueError('CursorPaginator requires an ordered queryset')
+        self.queryset = queryset
+        self.per_page = per_page
+        self.keys = [key.lstrip('-') for key in ordering]
+        self.descending = [key.startswith('-') for key in ordering]
+
+    def page(self, cursor=None, number=1):
+        rows, direction = self._rows(cursor, number)
+        rows = list(rows)
+        if not rows and direction is None and number > 1:
+            number = self._last_number(self._before(number).count())
+            rows = list(self._rows(None, number)[0])
+        return self._rows_page(rows, direction, number)
+
+    async def apage(self, cursor=None, number=1):
+        rows, direction = self._rows(cursor, number)
+        rows = [row async for row in rows]
+        if not rows and direction is None and number > 1:
+            number = self._last_number(await self._before(number).acount())
+            rows = [row async for row in self._rows(None, number)[0]]
+        return self._rows_page(rows, direction, number)
+
+    def _before(self, number):
+        # An offset page past the end shows the last one, like Paginator.get_page.
+        # Only the rows before it are counted.
+        return self.queryset.values('pk')[:(number - 1) * self.per_page]
+
+    def _last_number(self, count):
+        return max((count + self.per_page - 1) // self.per_page, 1)
+
+    def _rows(self, cursor, number):
+        # One row past the page tells whether there is a next one.
+        position = self.decode(cursor)
+        if position is None:
+            offset = (number - 1) * self.per_page
+            return self.queryset.values_list('pk', *self.keys)[offset:offset + self.per_page + 1], None
+
+        direction, values = position
+        queryset = self.queryset.filter(self._seek(values, direction))
+        if direction == self.PREVIOUS:
+            queryset = queryset.reverse()
+        return queryset.values_list('pk', *self.keys)[:self.per_page + 1], direction
+
+    def _rows_page(self, rows, direction, number):
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction is None:
+            return self._page(rows, has_next=more, has_previous=number > 1)
+        if direction == self.PREVIOUS:
+            rows.reverse()
+            return self._page(rows, has_next=True, has_previous=more)
+        return self._page(rows, has_next=more, has_previous=True)
+
+    def _page(self, rows, has_next, has_previous):
+        object_list = self.queryset.filter(pk__in=[row[0] for row in rows])
+        next_cursor = self.encode(self.NEXT, rows[-1][1:]) if has_next and rows else None
+        previous_cursor = self.encode(self.PREVIOUS, rows[0][1:]) if has_previous and rows else None
+        return CursorPage(object_list, next_cursor, previous_cursor)
+
+    def _seek(self, values, direction):
+        condition = Q()
+        for i, key in enumerate(self.keys):
+            step = Q(**{key: value for key, value in zip(self.keys[:i], values[:i])})
+            step &= Q(**{f'{key}__{self._lookup(i, direction)}': values[i]})
+            condition |= step
+        # The redundant bound on the leading key lets the database turn the seek into an index range scan.
+        return Q(**{f'{self.keys[0]}__{self._lookup(0, direction)}e': values[0]}) & condition
+
+    def _lookup(self, i, direction):
+        return 'lt' if self.descending[i] == (direction == self.NEXT) else 'gt'
+
+    def encode(self, direction, values):
+        payload = json.dumps([direction, [self._dump(value) for value in values]], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        if not cursor:
+            return None
+        try:
+            payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(payload)
+            if direction not in (self.NEXT, self.PREVIOUS) or len(values) != len(self.keys):
+                return None
+            return direction, [self._load(key, value) for key, value in zip(self.keys, values)]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            return None
+
+    def _dump(self, value):
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    def _load(self, key, value):
+        annotation = self.queryset.query.annotations.get(key)
+        if annotation is not None:
+            return annotation.output_field.to_python(value)
+        try:
+            field = self.queryset.model._meta.get_field(key)
+        except FieldDoesNotExist:
+            return value
+        return field.to_python(value)
@@ -0,0 +1,109 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import asyncio
+import random
+
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+PRIMARY = 'default'
+
+# Reads only go to a replica inside read_from_replica(); everything else stays on the primary.
+replica_reads = ContextVar('replica_reads', default=False)
+# The pin of the request being served, see primary_pin_middleware.
+request_pin = ContextVar('request_pin', default=None)
+
+
+class Pin:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not settings.REPLICA_DATABASES or not replica_reads.get():
+            return PRIMARY
+        pin = request_pin.get()
+        if pin is not None and (pin.pinned or pin.wrote):
+            return PRIMARY
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        pin = request_pin.get()
+        if pin is not None:
+            pin.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, they are never migrated on their own.
+        return db not in settings.REPLICA_DATABASES
+
+
+@contextmanager
+def replica_scope(enabled=True):
+    token = replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def primary_scope():
+    # For writes made from a replica scope: what they read (the counts and scores they
+    # recompute) must not come from a replica that is behind.
+    return replica_scope(False)
+
+
+def read_from_replica(view):
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            with replica_scope():
+                return await view(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with replica_scope():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def finish(request, response, pin):
+    # Read-your-writes: after a write the client reads from the primary until the
+    # replicas have caught up.
+    if pin.wrote:
+        response.set_cookie(settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                            httponly=True, samesite='Lax')
+    return response
+
+
+@sync_and_async_middleware
+def primary_pin_middleware(get_response):
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            pin = Pin(settings.REPLICA_PIN_COOKIE in request.COOKIES)
+            token = request_pin.set(pin)
+            try:
+                response = await get_response(request)
+            finally:
+                request_pin.reset(token)
+            return finish(request, response, pin)
+    else:
+        def middleware(request):
+            pin = Pin(settings.REPLICA_PIN_COOKIE in request.COOKIES)
+            token = request_pin.set(pin)
+            try:
+                response = get_response(request)
+            finally:
+                request_pin.reset(token)
+            return finish(request, response, pin)
+    return middleware
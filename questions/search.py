@@ -0,0 +1,109 @@
+import re
+import sys
+
+from django.db import connection, connections
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+QUESTION_FTS = 'questions_question_fts'
+ANSWER_FTS = 'questions_answer_fts'
+
+# fts table: (content table, indexed columns). Migration 0005 creates the index from these.
+FTS_TABLES = {
+    QUESTION_FTS: ('questions_question', ('title', 'text')),
+    ANSWER_FTS: ('questions_answer', ('text',)),
+}
+
+SEARCH_LIMIT = 500
+SNIPPET_TOKENS = 24
+
+# Private-use sentinels, replaced by <mark> after the snippet has been escaped.
+MARK_START = '\ue000'
+MARK_END = '\ue001'
+
+SEARCH_SQL = f'''
+    SELECT question_id, MIN(rank), snippet FROM (
+        SELECT rowid AS question_id, bm25({QUESTION_FTS}, 5.0, 1.0) AS rank,
+               snippet({QUESTION_FTS}, -1, %s, %s, '…', {SNIPPET_TOKENS}) AS snippet
+        FROM {QUESTION_FTS} WHERE {QUESTION_FTS} MATCH %s
+        UNION ALL
+        SELECT answer.question_id, bm25({ANSWER_FTS}) AS rank,
+               snippet({ANSWER_FTS}, 0, %s, %s, '…', {SNIPPET_TOKENS}) AS snippet
+        FROM {ANSWER_FTS} JOIN questions_answer answer ON answer.id = {ANSWER_FTS}.rowid
+        WHERE {ANSWER_FTS} MATCH %s
+    ) GROUP BY question_id ORDER BY MIN(rank) LIMIT %s
+'''
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    # Every word becomes a quoted prefix term, so user input can never be FTS5 syntax.
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', query))
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def search_questions(query, limit=SEARCH_LIMIT):
+    match = match_expression(query)
+    if not match or not is_available():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_SQL, [MARK_START, MARK_END, match, MARK_START, MARK_END, match, limit])
+        return [(question_id, highlight(snippet)) for question_id, rank, snippet in cursor.fetchall()]
+
+
+def rebuild():
+    with connection.cursor() as cursor:
+        for table in (QUESTION_FTS, ANSWER_FTS):
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+
+
+def table_statements():
+    for fts, (table, columns) in FTS_TABLES.items():
+        names = ', '.join(columns)
+        yield f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table}', content_rowid='id', tokenize='unicode61')"
+
+
+def trigger_statements():
+    for fts, (table, columns) in FTS_TABLES.items():
+        names = ', '.join(columns)
+        new_values = ', '.join(f'new.{column}' for column in columns)
+        old_values = ', '.join(f'old.{column}' for column in columns)
+        delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+        insert = f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values});'
+        yield f'{fts}_ai', f'AFTER INSERT ON {table} BEGIN {insert} END'
+        yield f'{fts}_ad', f'AFTER DELETE ON {table} BEGIN {delete} END'
+        yield f'{fts}_au', f'AFTER UPDATE OF {names} ON {table} BEGIN {delete} {insert} END'
+
+
+def ensure_triggers(using='default'):
+    # SQLite drops the triggers of a table it rebuilds (AlterField, RemoveField...), and the
+    # index would silently stop following the posts. Recreated after every migrate; the
+    # rows written without them are picked up by a rebuild. Returns the recreated ones.
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return []
+    with db.cursor() as cursor:
+        cursor.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {(kind, name) for kind, name in cursor.fetchall()}
+        if not all(('table', fts) in existing for fts in FTS_TABLES):
+            return []
+        missing = [(name, body) for name, body in trigger_statements() if ('trigger', name) not in existing]
+        for name, body in missing:
+            cursor.execute(f'CREATE TRIGGER {name} {body}')
+        if missing:
+            for fts in FTS_TABLES:
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    return [name for name, body in missing]
+
+
+def recreate_triggers(using, verbosity=1, stdout=sys.stdout, **kwargs):
+    names = ensure_triggers(using)
+    if names and verbosity:
+        stdout.write(f'  Recreated the search triggers {", ".join(names)} and rebuilt the index\n')
@@ -0,0 +1,137 @@
+import hashlib
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from questions.models import Tag, Profile
+from questions.routers import replica_scope
+
+logger = logging.getLogger('questions.sidebar')
+
+
+class SidebarCache:
+    # Stale data is served while a background thread recomputes it,
+    # so requests only wait for the aggregates on a cold start.
+
+    def __init__(self, ttl=60, background=True):
+        self.ttl = ttl
+        self.background = background
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._data = None
+        self._expires = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._dirty = False
+        # What the sidebar shows and since when, for the validators of the pages
+        # (questions/conditional.py): refreshes that find the same data keep them.
+        self.version = None
+        self.changed = 0
+
+    def compute(self):
+        with replica_scope():
+            return self._compute()
+
+    def _compute(self):
+        return {
+            'top_tag': list(Tag.objects.top_tags()),
+            'top_author': list(Profile.objects.top_users().select_related('user')),
+            'tags_list': list(Tag.objects.all()),
+        }
+
+    def get(self):
+        data = self._data
+        if data is None:
+            self.misses += 1
+            return self.refresh()
+        self.hits += 1
+        if time.monotonic() >= self._expires:
+            self.schedule_refresh()
+        return data
+
+    async def aget(self):
+        # Only a cold (or, without the background thread, stale) cache touches the database.
+        # That happens on a worker thread of its own, so the page queries of the request
+        # run meanwhile instead of queueing behind it.
+        if self._data is not None and (self.background or time.monotonic() < self._expires):
+            return self.get()
+        return await sync_to_async(self._get_and_close, thread_sensitive=False)()
+
+    def _get_and_close(self):
+        try:
+            return self.get()
+        finally:
+            connections.close_all()
+
+    def refresh(self):
+        data = self.compute()
+        version = self.signature(data)
+        if version != self.version:
+            self.version, self.changed = version, time.time()
+        self._data = data
+        self._expires = time.monotonic() + self.ttl
+        self.refreshes += 1
+        return data
+
+    def signature(self, data):
+        shown = ([tag.name for tag in data['top_tag']], [str(author.user) for author in data['top_author']],
+                 [tag.name for tag in data['tags_list']])
+        return hashlib.md5(repr(shown).encode()).hexdigest()[:16]
+
+    def invalidate(self):
+        self._expires = 0
+        if not self.background:
+            self._data = None
+            return
+        self.schedule_refresh()
+
+    def schedule_refresh(self):
+        if not self.background:
+            self.refresh()
+            return
+        with self._lock:
+            self._dirty = True
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_loop, name='sidebar-refresh', daemon=True).start()
+
+    def _refresh_loop(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._dirty:
+                        self._refreshing = False
+                        return
+                    self._dirty = False
+                try:
+                    self.refresh()
+                except Exception:
+                    # Still stale: the next request that finds it expired tries again.
+                    logger.exception('Could not refresh the sidebar')
+                    with self._lock:
+                        self._dirty = True
+                        self._refreshing = False
+                    return
+        finally:
+            connections.close_all()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'ttl': self.ttl,
+            'fresh': self._data is not None and time.monotonic() < self._expires,
+        }
+
+
+sidebar = SidebarCache(
+    ttl=getattr(settings, 'SIDEBAR_CACHE_TTL', 60),
+    background=getattr(settings, 'SIDEBAR_CACHE_BACKGROUND', True),
+)
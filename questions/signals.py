@@ -0,0 +1,232 @@
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from questions.models import Profile, Question, Answer, Reputation, Tag, QuestionTag, tag_id_cache_key, hot_score
+from questions.sidebar import sidebar
+from questions.caching import bump
+from questions.auth import user_cache_key
+from questions import live
+
+
+def shift_votes(reputation, old=0, new=0):
+    model = ContentType.objects.get_for_id(reputation.content_type_id).model_class()
+    if model in (Question, Answer):
+        model.objects.shift_votes(reputation.object_id, old=old, new=new)
+    if model is Question:
+        Question.objects.update_hot_scores(Question.objects.filter(id=reputation.object_id))
+
+
+@receiver(post_save, sender=Reputation)
+def reputation_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = 0 if created else getattr(instance, '_loaded_reputation', None) or 0
+    if old != instance.reputation:
+        shift_votes(instance, old=old, new=instance.reputation)
+
+
+@receiver(post_delete, sender=Reputation)
+def reputation_deleted(sender, instance, **kwargs):
+    old = getattr(instance, '_loaded_reputation', instance.reputation) or 0
+    shift_votes(instance, old=old)
+
+
+@receiver(post_save, sender=Question)
+def question_created(sender, instance, created, raw=False, **kwargs):
+    # The score only needs the publish date until the first vote or answer.
+    if created and not raw:
+        instance.hot_score = hot_score(instance.rating, 0, instance.pub_date)
+        Question.objects.filter(id=instance.id).update(hot_score=instance.hot_score)
+
+
+@receiver(post_save, sender=Answer)
+def answer_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Question.objects.update_hot_scores(Question.objects.filter(id=instance.question_id))
+
+
+@receiver(post_delete, sender=Answer)
+def answer_deleted(sender, instance, **kwargs):
+    Question.objects.update_hot_scores(Question.objects.filter(id=instance.question_id))
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Answer)
+@receiver(post_save, sender=Tag)
+def sidebar_source_saved(sender, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(sidebar.invalidate)
+
+
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Answer)
+@receiver(post_delete, sender=Tag)
+@receiver(m2m_changed, sender=Question.tags.through)
+def sidebar_source_changed(sender, **kwargs):
+    if kwargs.get('action', 'post_delete').startswith('post_'):
+        transaction.on_commit(sidebar.invalidate)
+
+
+@receiver(m2m_changed, sender=Question.tags.through)
+def question_tags_added(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        Tag.objects.shift_question_counts([instance.pk], len(pk_set))
+    else:
+        Tag.objects.shift_question_counts(pk_set, 1)
+
+
+@receiver(m2m_changed, sender=Question.tags.through)
+def question_tags_dated(sender, instance, action, reverse, pk_set, **kwargs):
+    # tags.add() inserts the links with the current time, and the tag feeds are ordered
+    # by it: give them the publish date of their question, as QuestionTag.save() does.
+    if action != 'post_add' or not pk_set:
+        return
+    links = (QuestionTag.objects.filter(tag_id=instance.pk, question_id__in=pk_set) if reverse
+             else QuestionTag.objects.filter(question_id=instance.pk, tag_id__in=pk_set))
+    links.update(pub_date=Subquery(Question.objects.filter(id=OuterRef('question_id')).values('pub_date')[:1]))
+
+
+@receiver(post_save, sender=QuestionTag)
+def question_tag_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Tag.objects.shift_question_counts([instance.tag_id], 1)
+
+
+@receiver(post_delete, sender=QuestionTag)
+def question_tag_deleted(sender, instance, **kwargs):
+    Tag.objects.shift_question_counts([instance.tag_id], -1)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    names = {instance.name, getattr(instance, '_loaded_name', None) or instance.name}
+    cache.delete_many([tag_id_cache_key(name) for name in names])
+
+
+PROFILE_COUNTERS = {Question: 'questions_count', Answer: 'answers_count'}
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Answer)
+def authored_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    field = PROFILE_COUNTERS[sender]
+    old = None if created else getattr(instance, '_loaded_profile_id', instance.profile_id)
+    if old != instance.profile_id:
+        Profile.objects.shift_count(old, field, -1)
+        Profile.objects.shift_count(instance.profile_id, field, 1)
+    instance._loaded_profile_id = instance.profile_id
+
+
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Answer)
+def authored_deleted(sender, instance, **kwargs):
+    profile_id = getattr(instance, '_loaded_profile_id', instance.profile_id)
+    Profile.objects.shift_count(profile_id, PROFILE_COUNTERS[sender], -1)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump('feeds', f'question:{instance.id}')
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def answer_changed(sender, instance, raw=False, **kwargs):
+    # The feed cards show the answers count and the hot feed orders by it.
+    if not raw:
+        bump('feeds', f'question:{instance.question_id}', f'answer:{instance.id}')
+
+
+@receiver(post_save, sender=Reputation)
+@receiver(post_delete, sender=Reputation)
+def reputation_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    model = ContentType.objects.get_for_id(instance.content_type_id).model_class()
+    if model is Question:
+        question_ids = [instance.object_id]
+        bump('feeds', f'question:{instance.object_id}')
+    elif model is Answer:
+        question_ids = list(Answer.objects.filter(id=instance.object_id).values_list('question_id', flat=True))
+        bump(*(f'question:{id}' for id in question_ids), f'answer:{instance.object_id}')
+    else:
+        return
+    transaction.on_commit(lambda: live.publish_votes(model, instance.object_id, question_ids))
+
+
+@receiver(post_save, sender=Answer)
+def answer_published(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: live.publish_answer(instance))
+
+
+@receiver(post_save, sender=QuestionTag)
+@receiver(post_delete, sender=QuestionTag)
+def question_tag_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump('feeds', f'question:{instance.question_id}')
+
+
+@receiver(m2m_changed, sender=Question.tags.through)
+def question_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    question_ids = pk_set or () if reverse else [instance.pk]
+    bump('feeds', *(f'question:{id}' for id in question_ids))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_renamed(sender, instance, raw=False, created=False, **kwargs):
+    if raw:
+        return
+    # The question cards show the tag names too. Deleted tags take their links along,
+    # and those bump their questions themselves.
+    question_ids = [] if created else list(
+        QuestionTag.objects.filter(tag_id=instance.id).values_list('question_id', flat=True))
+    bump('feeds', *(f'question:{id}' for id in question_ids))
+
+
+def profile_pages(profile_id):
+    # The author's name and avatar are on the cards of the feeds, of their questions and
+    # of the questions they answered, and those pages are cached as a whole.
+    question_ids = set(Question.objects.filter(profile_id=profile_id).values_list('id', flat=True))
+    question_ids.update(Answer.objects.filter(profile_id=profile_id).values_list('question_id', flat=True))
+    return ['feeds', f'profile:{profile_id}', *(f'question:{id}' for id in sorted(question_ids))]
+
+
+@receiver(post_save, sender=Profile)
+def profile_changed(sender, instance, raw=False, created=False, **kwargs):
+    if not raw:
+        bump(*([f'profile:{instance.id}'] if created else profile_pages(instance.id)))
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, raw=False, created=False, update_fields=None, **kwargs):
+    # The cards show the username. Logins only save last_login.
+    if raw or created or (update_fields is not None and 'username' not in update_fields):
+        return
+    profile_id = Profile.objects.filter(user_id=instance.id).values_list('id', flat=True).first()
+    if profile_id is not None:
+        bump(*profile_pages(profile_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def cached_user_changed(sender, instance, **kwargs):
+    user_id = instance.id if sender is User else instance.user_id
+    transaction.on_commit(lambda: cache.delete(user_cache_key(user_id)))
@@ -0,0 +1,274 @@
+from pathlib import Path
+import asyncio
+import gzip
+import mimetypes
+import os
+import re
+
+import brotli
+import sass
+from django.conf import settings
+from django.contrib.staticfiles.finders import BaseFinder
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, HttpResponseNotAllowed
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import sync_and_async_middleware
+
+# The static files pipeline: SCSS is compiled by a finder (so runserver serves it too),
+# collectstatic minifies the CSS and JS, names every file after its content and writes
+# gzip and brotli copies, and the middleware serves those with far-future headers.
+
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.xml', '.ttf', '.eot')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class ScssFinder(BaseFinder):
+    # Finds css/<name>.css for every css/<name>.scss of STATICFILES_DIRS, compiled into
+    # SCSS_BUILD_DIR whenever the source is newer.
+
+    def __init__(self, *args, **kwargs):
+        self.storage = FileSystemStorage(location=settings.SCSS_BUILD_DIR)
+
+    def sources(self):
+        for directory in settings.STATICFILES_DIRS:
+            for source in Path(directory).rglob('*.scss'):
+                if not source.name.startswith('_'):
+                    yield source.relative_to(directory).with_suffix('.css').as_posix(), source
+
+    def compile(self, name, source):
+        target = Path(self.storage.path(name))
+        if not target.exists() or target.stat().st_mtime < source.stat().st_mtime:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(sass.compile(filename=str(source), output_style='expanded'))
+        return str(target)
+
+    def find(self, path, all=False):
+        for name, source in self.sources():
+            if name == path:
+                found = self.compile(name, source)
+                return [found] if all else found
+        return []
+
+    def list(self, ignore_patterns):
+        for name, source in self.sources():
+            self.compile(name, source)
+            yield name, self.storage
+
+
+def minify_css(content):
+    try:
+        return sass.compile(string=content, output_style='compressed')
+    except sass.CompileError:
+        return content
+
+
+# A '/' after one of these, or at the start, begins a regular expression rather than a division.
+REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+REGEX_KEYWORDS = re.compile(r'\b(?:return|typeof|case|do|else|in|of|void|yield|await|delete|throw|new)\s*$')
+
+
+def literal_end(content, i, quote):
+    # Where the string, template or regular expression opened by `quote` before i ends:
+    # past its closing quote, or past the '${' of a template expression.
+    in_class = False
+    while i < len(content):
+        c = content[i]
+        if c == '\\':
+            i += 2
+            continue
+        if quote == '/':
+            if c == '\n':
+                return i
+            if c == '[' or c == ']':
+                in_class = c == '['
+            elif c == '/' and not in_class:
+                return i + 1
+        elif c == quote:
+            return i + 1
+        elif quote == '`' and content.startswith('${', i):
+            return i + 2
+        i += 1
+    return i
+
+
+def minify_js(content):
+    # Not a full minifier: drops comments, indentation and blank lines, and copies strings,
+    # template literals and regular expressions as they are. Line breaks are kept, as
+    # automatic semicolon insertion depends on them.
+    pieces, code = [], []
+    templates = []  # brace depth inside each open ${...}
+    last = ''
+    i = 0
+    while i < len(content):
+        c, following = content[i], content[i + 1:i + 2]
+        if c == '/' and following == '/':
+            end = content.find('\n', i)
+            i = len(content) if end < 0 else end
+            continue
+        if c == '/' and following == '*':
+            end = content.find('*/', i + 2)
+            end = len(content) if end < 0 else end + 2
+            code.append('\n' if '\n' in content[i:end] else ' ')
+            i = end
+            continue
+        resumed = c == '}' and templates and templates[-1] == 0
+        if c in '\'"`' or resumed or (c == '/' and (
+                not last or last in REGEX_PRECEDERS or REGEX_KEYWORDS.search(content[max(i - 8, 0):i]))):
+            if resumed:
+                templates.pop()
+            end = literal_end(content, i + 1, '`' if resumed else c)
+            if content.startswith('${', end - 2) and (c == '`' or resumed):
+                templates.append(0)
+            pieces.append((''.join(code), content[i:end]))
+            code, last = [], content[end - 1]
+            i = end
+            continue
+        if templates and c in '{}':
+            templates[-1] += 1 if c == '{' else -1
+        code.append(c)
+        if not c.isspace():
+            last = c
+        i += 1
+    pieces.append((''.join(code), ''))
+    minified = ''.join(re.sub(r'[ \t]*\n\s*', '\n', code) + literal for code, literal in pieces)
+    return minified.strip() + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def own_locations():
+    # Only the project's files are minified: those of STATICFILES_DIRS and the compiled SCSS.
+    # Vendored files (admin, fontawesome) are served as their authors shipped them.
+    directories = [entry[1] if isinstance(entry, (list, tuple)) else entry for entry in settings.STATICFILES_DIRS]
+    return {Path(directory).resolve() for directory in [*directories, settings.SCSS_BUILD_DIR]}
+
+
+class PipelineStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        # Before collectstatic (tests, runserver) the files are used by their own names.
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        # Minified first, so the hashes are those of what is served. The collected copies
+        # are hashed instead of the sources then.
+        own = own_locations()
+        for name, (storage, path) in list(paths.items()):
+            minify = MINIFIERS.get(os.path.splitext(name)[1])
+            if minify is None or '.min.' in name or Path(getattr(storage, 'location', '')).resolve() not in own:
+                continue
+            with self.open(name) as file:
+                content = file.read().decode()
+            minified = minify(content)
+            if len(minified) < len(content):
+                self.delete(name)
+                self._save(name, ContentFile(minified.encode()))
+            paths[name] = (self, name)
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        for name in self.hashed_files.values():
+            if name.endswith(COMPRESSED_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as file:
+            content = file.read()
+        for encoded, extension in ((brotli.compress(content, quality=11), '.br'),
+                                   (gzip.compress(content, compresslevel=9, mtime=0), '.gz')):
+            if len(encoded) < len(content):
+                if self.exists(name + extension):
+                    self.delete(name + extension)
+                self._save(name + extension, ContentFile(encoded))
+
+
+def accepted_encodings(header):
+    # Accept-Encoding as {coding: q}, e.g. 'gzip, br;q=0' is {'gzip': 1.0, 'br': 0.0}.
+    accepted = {}
+    for part in header.split(','):
+        coding, *params = (item.strip() for item in part.split(';'))
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality
+    return accepted
+
+
+class StaticFiles:
+    # The collected files and their compressed copies, indexed once: a request for a
+    # static file never touches the disk before the file is opened.
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.files = {}
+        if self.root.is_dir():
+            for path in self.root.rglob('*'):
+                if path.is_file() and path.suffix not in ('.br', '.gz'):
+                    name = path.relative_to(self.root).as_posix()
+                    self.files[name] = [(encoding, Path(f'{path}{extension}')) for encoding, extension in ENCODINGS
+                                        if Path(f'{path}{extension}').exists()]
+        self.immutable = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def response(self, request, name):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        path, encoding = self.root / name, None
+        for candidate, candidate_path in self.files[name]:
+            if accepted.get(candidate, accepted.get('*', 0)) > 0:
+                path, encoding = candidate_path, candidate
+                break
+        response = FileResponse(open(path, 'rb'), content_type=mimetypes.guess_type(name)[0] or 'application/octet-stream')
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+        if self.files[name]:
+            patch_vary_headers(response, ['Accept-Encoding'])
+        # Hashed names change with their content, so they can be kept forever.
+        max_age = settings.STATIC_MAX_AGE if name in self.immutable else settings.STATIC_UNHASHED_MAX_AGE
+        response['Cache-Control'] = f'public, max-age={max_age}' + (', immutable' if name in self.immutable else '')
+        return response
+
+
+@sync_and_async_middleware
+def static_files_middleware(get_response):
+    # In development the finders serve the sources, which a stale collectstatic output
+    # would shadow.
+    if settings.DEBUG or not settings.STATIC_ROOT:
+        raise MiddlewareNotUsed
+    prefix = settings.STATIC_URL
+    static_files = StaticFiles(settings.STATIC_ROOT)
+
+    def find(request):
+        if not request.path_info.startswith(prefix):
+            return None
+        name = request.path_info[len(prefix):]
+        return name if name in static_files.files else None
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            name = find(request)
+            if name is not None:
+                return static_files.response(request, name)
+            return await get_response(request)
+    else:
+        def middleware(request):
+            name = find(request)
+            if name is not None:
+                return static_files.response(request, name)
+            return get_response(request)
+    return middleware
@@ -3,19 +3,28 @@ from django.contrib.auth.views import LogoutView
 from django.conf import settings
 from django.conf.urls.static import static
 
-from . import views
+from . import views, async_views
+from .models import Question, Answer
 
 app_name = 'questions'
 
+# Under ASGI the read views are served by their async twins.
+read_views = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
-    path('', views.index, name='index'),
-    path('tag/<str:tag>/', views.tag, name='list_with_tag'),
-    path('hot/', views.hot, name='hot_list'),
-    path('page/<int:page>/', views.index, name='list_page'),
+    path('', read_views.index, name='index'),
+    path('tag/<str:tag>/', read_views.tag, name='list_with_tag'),
+    path('hot/', read_views.hot, name='hot_list'),
+    path('search/', views.search, name='search'),
+    path('page/<int:page>/', read_views.index, name='list_page'),
     path('ask/', views.new_question, name='new_question'),
-    path('question/<int:id>/', views.question, name='question'),
+    path('question/<int:id>/', read_views.question, name='question'),
+    path('question/<int:id>/vote/', views.vote, {'model': Question}, name='question_vote'),
+    path('answer/<int:id>/vote/', views.vote, {'model': Answer}, name='answer_vote'),
     path('login/', views.sign_in, name='sign_in'),
     path('signup/', views.sign_up, name='sign_up'),
     path('logout/', views.logout, name='logout'),
-    path('settings/', views.settings, name='settings')
+    path('settings/', views.settings, name='settings'),
+    path('internal/sidebar/', views.sidebar_stats, name='sidebar_stats'),
+    path('internal/metrics/', views.request_metrics_stats, name='request_metrics'),
 ]
@@ -1,96 +1,159 @@
 from django.shortcuts import render, redirect
 from django.core.paginator import Paginator
-from django.views.decorators.http import require_GET, require_http_methods
+from django.views.decorators.http import require_GET, require_POST, require_http_methods
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.urls import reverse
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.contrib import auth
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Count, Prefetch
 
-from questions.models import Question, Profile, Tag, Answer, Reputation
+from questions.models import Question, Tag, Answer, Reputation
 from questions.forms import RegistrationForm, LoginForm, QuestionForm, AnswerForm, SettingsForm
+from questions.sidebar import sidebar
+from questions.metrics import request_metrics
+from questions.routers import read_from_replica
+from questions.live import events_url
+from questions.writes import write
+from questions.caching import cache_anonymous, card_versions
+from questions.conditional import conditional
+from questions.pagination import CursorPaginator
+from questions.search import search_questions
+from questions.auth import get_profile, login_redirect
 
-tag_list = Tag.objects.all()
-top_tag = Tag.objects.top_tags()
-top_author = Profile.objects.top_users()
+FEED_MAX_OFFSET_PAGE = 10
+
+VOTES = {'like': Reputation.LIKE, 'dislike': Reputation.DISLIKE, 'retract': 0}
+
+def question_card(question, tags, version):
+    return {
+        'id': question.id,
+        'version': version,
+        'author': question.profile,
+        'title': question.title,
+        'body': question.text,
+        'date_publicate': f'Дата публикации {question.pub_date}',
+        'tags': tags,
+        'count_answers': question.count_answers,
+        'likes_count': question.likes_count,
+        'dislikes_count': question.dislikes_count,
+    }
 
 def question_instance(question_list):
-    question_objects = [{
-        'id': question_list[i].id,
-        'author': question_list[i].profile,
-        'title': question_list[i].title,
-        'body': question_list[i].text,
-        'date_publicate': f'Дата публикации {question_list[i].pub_date}',
-        'tags': [question_list[i].tags.all()[j] for j in range(len(question_list[i].tags.all()))],
-        'count_answers': Answer.objects.by_question(question_list[i].id).count(),
-        'likes_count': question_list[i].reputations.likes(),
-        'dislikes_count': question_list[i].reputations.dislikes(),
-    } for i in range(len(question_list))]
-    return question_objects
+    questions = list(question_list.select_related('profile__user')
+                     .prefetch_related(Prefetch('tags', queryset=Tag.objects.order_by('id')))
+                     .annotate(count_answers=Count('answer')))
+    card_version = card_versions('question', [(question.id, question.profile_id) for question in questions])
+    return [question_card(question, list(question.tags.all()), card_version[question.id]) for question in questions]
+
+def answer_card(answer, version):
+    return {
+        'id': answer.id,
+        'version': version,
+        'author': answer.profile,
+        'text': answer.text,
+        'date_publicate': f'Дата публикации {answer.pub_date}',
+        'likes_count': answer.likes_count,
+        'dislikes_count': answer.dislikes_count,
+    }
 
 def answers_instance(answer_list):
-    answer_objects = [{
-        'id': answer_list[i].id,
-        'author': answer_list[i].profile,
-        'text': answer_list[i].text,
-        'date_publicate': f'Дата публикации {answer_list[i].pub_date}',
-        'likes_count': answer_list[i].reputations.likes(),
-        'dislikes_count': answer_list[i].reputations.dislikes(),
-    } for i in range(len(answer_list))]
-    return answer_objects
-
-def paginate(object_list, request, per_page=5):
+    answers = list(answer_list.select_related('profile__user'))
+    card_version = card_versions('answer', [(answer.id, answer.profile_id) for answer in answers])
+    return [answer_card(answer, card_version[answer.id]) for answer in answers]
+
+def paginate(object_list, request, per_page=5, instance=None):
     items_paginator = Paginator(object_list, per_page)
     page_num = request.GET.get('page')
     page = items_paginator.get_page(page_num)
+    if instance is not None:
+        page.object_list = instance(page.object_list)
+    return page
+
+def feed_page_number(request):
+    # Old ?page= links keep working: anything invalid is the first page, and the
+    # offset pages stop at FEED_MAX_OFFSET_PAGE, past which the cursors take over.
+    page_num = request.GET.get('page', '1')
+    if not page_num.isdigit():
+        return 1
+    return min(max(int(page_num), 1), FEED_MAX_OFFSET_PAGE)
+
+def paginate_feed(question_list, request, per_page=5):
+    page = CursorPaginator(question_list, per_page).page(request.GET.get('cursor'), feed_page_number(request))
+    page.object_list = question_instance(page.object_list)
     return page
 
+@conditional('feeds')
+@cache_anonymous('feeds')
+@read_from_replica
 def index(request):
     template = 'questions/index.html'
     context = {
-        'top_author': top_author,
-        'tags_list': tag_list,
-        'top_tag': top_tag,
-        'page_obj': paginate(question_instance(Question.objects.new()), request)
+        **sidebar.get(),
+        'page_obj': paginate_feed(Question.objects.new(), request)
     }
     return render(request, template, context)
 
+@conditional('feeds')
+@cache_anonymous('feeds')
+@read_from_replica
 def tag(request, tag: str):
     template = 'questions/index.html'
     context = {
-        'top_author': top_author,
-        'tags_list': tag_list,
-        'top_tag': top_tag,
-        'page_obj': paginate(question_instance(Question.objects.by_tag(tag)), request)
+        **sidebar.get(),
+        'page_obj': paginate_feed(Question.objects.by_tag(tag), request)
     }
     return render(request, template, context)
 
+@conditional('feeds')
+@cache_anonymous('feeds')
+@read_from_replica
 def hot(request):
     template = 'questions/index.html'
     context = {
-        'top_author': top_author,
-        'tags_list': tag_list,
-        'top_tag': top_tag,
-        'page_obj': paginate(question_instance(Question.objects.hot()), request)
+        **sidebar.get(),
+        'page_obj': paginate_feed(Question.objects.hot(), request)
+    }
+    return render(request, template, context)
+
+def search_instance(results):
+    snippets = dict(results)
+    questions = {card['id']: card for card in question_instance(Question.objects.filter(id__in=snippets))}
+    return [{**questions[id], 'snippet': snippet} for id, snippet in results if id in questions]
+
+@require_GET
+def search(request):
+    template = 'questions/search.html'
+    query = request.GET.get('q', '').strip()
+    context = {
+        **sidebar.get(),
+        'search_query': query,
+        'page_obj': paginate(search_questions(query), request, instance=search_instance),
     }
     return render(request, template, context)
 
 @require_http_methods(['GET', 'POST'])
+@conditional('question:{id}')
+@cache_anonymous('question:{id}')
+@read_from_replica
 def question(request, id: int):
-    print(request.user)
     template = 'questions/question.html'
     if request.method == 'GET':
         answer_form = AnswerForm()
     if request.method == 'POST':
+        if get_profile(request) is None:
+            return login_redirect(request)
         answer_form = AnswerForm(data=request.POST)
         if answer_form.is_valid():
-            answer_form.save(request, id)
+            write(answer_form.save, request, id)
     context = {
         'form': answer_form,
         'question': question_instance(Question.objects.by_id(id))[0],
-        'top_author': top_author,
-        'top_tag': top_tag,
-        'page_obj': paginate(answers_instance(Answer.objects.by_question(id)), request),
+        **sidebar.get(),
+        'page_obj': paginate(Answer.objects.by_question(id), request, instance=answers_instance),
         'closed': False,
+        'events_url': events_url(id),
     }
     return render(request, template, context)
 
@@ -100,29 +163,32 @@ def new_question(request):
     if request.method == 'GET':
         question_form = QuestionForm()
     if request.method == 'POST':
+        if get_profile(request) is None:
+            return login_redirect(request)
         question_form = QuestionForm(data=request.POST)
         if question_form.is_valid():
-            question_form.save(request)
+            write(question_form.save, request)
     context = {
         'form': question_form,
-        'top_author': top_author,
-        'top_tag': top_tag,
+        **sidebar.get(),
     }
     return render(request, template, context)
 
 
 def settings(request):
     template = 'questions/profile_update.html'
+    profile = get_profile(request)
+    if profile is None:
+        return login_redirect(request)
     if request.method == 'GET':
         edit_form = SettingsForm(instance=request.user)
     if request.method == 'POST':
-        edit_form = SettingsForm(data=request.POST, files=request.FILES, instance=Profile.objects.get(user=request.user))
+        edit_form = SettingsForm(data=request.POST, files=request.FILES, instance=profile)
         if edit_form.is_valid():
             edit_form.save()
     context = {
         'form': edit_form,
-        'top_author': top_author,
-        'top_tag': top_tag,
+        **sidebar.get(),
     }
     return render(request, template, context)
 
@@ -144,8 +210,7 @@ def sign_in(request):
                 login_form.add_error('password', "")
     context = {
         'form': login_form,
-        'top_author': top_author,
-        'top_tag': top_tag,
+        **sidebar.get(),
     }
     return render(request, template, context)
 
@@ -162,12 +227,44 @@ def sign_up(request):
             return redirect('/')
     context = {
         'form': registration_form,
-        'top_author': top_author,
-        'top_tag': top_tag,
+        **sidebar.get(),
     }
     return render(request, template, context = context)
 
+# Anonymous pages carry no CSRF token: an anonymous vote gets its JSON message before
+# the CSRF check, which would answer with an HTML page instead.
+@csrf_exempt
+@require_POST
+def vote(request, model, id: int):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Авторизируйтесь, чтобы голосовать'}, status=401)
+    return checked_vote(request, model, id)
+
+@csrf_protect
+def checked_vote(request, model, id):
+    value = VOTES.get(request.POST.get('vote'))
+    if value is None:
+        return JsonResponse({'error': 'Неизвестный голос'}, status=400)
+    profile = get_profile(request)
+    if profile is None:
+        return JsonResponse({'error': 'Профиль не найден'}, status=403)
+    try:
+        counts = write(Reputation.objects.vote, profile, model, id, value)
+    except model.DoesNotExist:
+        return JsonResponse({'error': 'Объект не найден'}, status=404)
+    return JsonResponse(counts)
+
 @login_required(login_url='login', redirect_field_name='continue')
 def logout(request):
     auth.logout(request)
-    return redirect('/')
\ No newline at end of file
+    return redirect('/')
+
+@staff_member_required
+@require_GET
+def sidebar_stats(request):
+    return JsonResponse(sidebar.stats())
+
+@staff_member_required
+@require_GET
+def request_metrics_stats(request):
+    return JsonResponse(request_metrics.summary())
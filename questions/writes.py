@@ -0,0 +1,126 @@
+from concurrent.futures import Future
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction, close_old_connections
+
+from questions.models import Question
+from questions.routers import primary_scope
+
+# With WRITE_QUEUE on, answers, questions and votes of this process are written by one
+# thread: it takes the SQLite write lock once for a short batch of them instead of every
+# request fighting for it, and hands each caller its own result or exception.
+
+
+class Job:
+    def __init__(self, function, args, kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        # The caller's context, so the writes count towards its request metrics and pin it
+        # to the primary (questions/routers.py). Its replica reads are not inherited.
+        self.context = contextvars.copy_context()
+        self.future = Future()
+
+    def run(self):
+        return self.context.run(on_primary, self.function, *self.args, **self.kwargs)
+
+
+class WriteQueue:
+    def __init__(self, batch_size=32, linger=0.002):
+        self.batch_size = batch_size
+        self.linger = linger
+        self._jobs = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args, **kwargs):
+        job = Job(function, args, kwargs)
+        self._start()
+        self._jobs.put(job)
+        return job.future
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, name='riddle-writer', daemon=True)
+                self._thread.start()
+
+    def _work(self):
+        while True:
+            batch = [self._jobs.get()]
+            # Wait a moment for the writes that arrive together, without holding the lock.
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._jobs.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            close_old_connections()
+            self.write(batch)
+
+    def write(self, batch):
+        done = []
+        try:
+            with transaction.atomic():
+                reserve()
+                for job in batch:
+                    if not job.future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        # A savepoint per job: a failing write is rolled back alone.
+                        with transaction.atomic():
+                            done.append((job, job.run()))
+                    except Exception as error:
+                        job.future.set_exception(error)
+        except Exception as error:
+            # The batch could not be committed, none of its writes happened.
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(error)
+            return
+        for job, result in done:
+            job.future.set_result(result)
+
+
+def reserve():
+    # SQLite starts transactions deferred: two of them that read first can't both upgrade to
+    # a write and one fails at once, busy timeout or not. Taking the write lock up front
+    # makes the batch wait for it instead.
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {Question._meta.db_table} SET id = id WHERE 0')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    # WAL lets the readers go on while a batch is being written.
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode = WAL')
+            cursor.execute('PRAGMA synchronous = NORMAL')
+
+
+def on_primary(function, *args, **kwargs):
+    with primary_scope():
+        return function(*args, **kwargs)
+
+
+def write(function, *args, **kwargs):
+    if not settings.WRITE_QUEUE:
+        return on_primary(function, *args, **kwargs)
+    return write_queue.submit(function, *args, **kwargs).result()
+
+
+async def awrite(function, *args, **kwargs):
+    if not settings.WRITE_QUEUE:
+        return await sync_to_async(on_primary)(function, *args, **kwargs)
+    return await asyncio.wrap_future(write_queue.submit(function, *args, **kwargs))
+
+
+write_queue = WriteQueue(batch_size=getattr(settings, 'WRITE_QUEUE_BATCH', 32),
+                         linger=getattr(settings, 'WRITE_QUEUE_LINGER', 0.002))
@@ -0,0 +1,20 @@
+// Новые ответы и голоса на странице вопроса без перезагрузки.
+document.addEventListener('DOMContentLoaded', () => {
+    const answers = document.querySelector('[data-events-url]');
+    if (!answers) {
+        return;
+    }
+    const events = new EventSource(answers.dataset.eventsUrl);
+    events.addEventListener('answer', (event) => {
+        const data = JSON.parse(event.data);
+        if (answers.hasAttribute('data-last-page') && !document.getElementById(`answer-${data.id}`)) {
+            answers.insertAdjacentHTML('beforeend', data.html);
+        }
+    });
+    events.addEventListener('votes', (event) => {
+        const data = JSON.parse(event.data);
+        document.querySelectorAll(`[data-vote-url="${data.url}"] [data-count]`).forEach((count) => {
+            count.textContent = data[count.dataset.count];
+        });
+    });
+});
@@ -0,0 +1,30 @@
+// Лайки и дизлайки без перезагрузки страницы.
+document.addEventListener('click', async (event) => {
+    const button = event.target.closest('[data-vote]');
+    const group = button && button.closest('[data-vote-url]');
+    if (!group) {
+        return;
+    }
+    const url = group.dataset.voteUrl;
+    const body = new URLSearchParams({vote: button.dataset.vote});
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: {'X-CSRFToken': document.querySelector('meta[name="csrf-token"]')?.content ?? ''},
+        body: body,
+    });
+    const data = await response.json();
+    if (!response.ok) {
+        alert(data.error);
+        return;
+    }
+    // Карточка рисует кнопки дважды: для широких и узких экранов.
+    document.querySelectorAll(`[data-vote-url="${url}"]`).forEach((voteGroup) => {
+        voteGroup.querySelectorAll('[data-count]').forEach((count) => {
+            count.textContent = data[count.dataset.count];
+        });
+        voteGroup.querySelectorAll('[data-vote]').forEach((voteButton) => {
+            const active = voteButton.dataset.vote === (data.vote > 0 ? 'like' : data.vote < 0 ? 'dislike' : '');
+            voteButton.classList.toggle('active', active);
+        });
+    });
+});